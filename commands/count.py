@@ -12,7 +12,6 @@ load_dotenv()
 
 # Récupération des variables d'environnement
 SERVER_ID = int(os.getenv("server_id", "0"))
-DB_PATH = os.getenv("db_path")
 
 
 class Count(commands.Cog):
@@ -36,7 +35,7 @@ class Count(commands.Cog):
             )
             return
 
-        if not DB_PATH:
+        if not database.DB_PATH:
             await interaction.response.send_message(
                 "Le chemin de la base de données n'est pas défini "
                 "dans les variables d'environnement.",
@@ -46,14 +45,37 @@ class Count(commands.Cog):
 
         # Enregistrer la configuration dans la base de données
         conn = database.get_db_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        # Vérifier si une configuration existe déjà pour ce serveur et ce canal
-        cursor.execute(
-            "SELECT * FROM counter_game WHERE guildId = ? AND channelId = ?",
-            (str(interaction.guild.id), str(channel.id)),
-        )
-        existing = cursor.fetchone()
+            # Vérifier si une configuration existe déjà pour ce serveur et ce canal
+            cursor.execute(
+                "SELECT * FROM counter_game WHERE guildId = ? AND channelId = ?",
+                (str(interaction.guild.id), str(channel.id)),
+            )
+            existing = cursor.fetchone()
+
+            if not existing:
+                # Insérer la nouvelle configuration
+                cursor.execute(
+                    """
+                    INSERT INTO counter_game
+                    (guildId, channelId, messageId, userId, lastUserId, count)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                    (
+                        str(interaction.guild.id),
+                        str(channel.id),
+                        "",
+                        str(interaction.user.id),
+                        "0",
+                        0,
+                    ),
+                )
+                conn.commit()
+        finally:
+            # Rendre la connexion avant d'attendre la réponse de Discord
+            conn.close()
 
         if existing:
             await interaction.response.send_message(
@@ -61,29 +83,8 @@ class Count(commands.Cog):
                 f"dans le salon {channel.mention}.",
                 ephemeral=True,
             )
-            conn.close()
             return
 
-        # Insérer la nouvelle configuration
-        cursor.execute(
-            """
-            INSERT INTO counter_game
-            (guildId, channelId, messageId, userId, lastUserId, count)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """,
-            (
-                str(interaction.guild.id),
-                str(channel.id),
-                "",
-                str(interaction.user.id),
-                "0",
-                0,
-            ),
-        )
-
-        conn.commit()
-        conn.close()
-
         await interaction.response.send_message(
             f"Le minijeux du compteur a été configuré "
             f"dans le salon {channel.mention}.",
@@ -164,7 +164,6 @@ class Moderation(commands.Cog):
                 history_text = []
                 for entry in history[:10]:  # Show last 10 entries
                     action = entry["action"]
-                    created_at = datetime.fromisoformat(entry["created_at"])
                     reason = entry["reason"] or "Aucune raison"
 
                     action_emoji = {
@@ -178,7 +177,7 @@ class Moderation(commands.Cog):
 
                     history_text.append(
                         f"{action_emoji} **{action.replace('_', ' ').title()}** "
-                        f"<t:{int(created_at.timestamp())}:R>\n"
+                        f"<t:{entry['created_ts']}:R>\n"
                         f"└─ {reason}"
                     )
 
@@ -432,12 +431,11 @@ class Moderation(commands.Cog):
                     log_entries = []
                     for entry in history[:15]:  # Show last 15 entries
                         action = entry["action"]
-                        created_at = datetime.fromisoformat(entry["created_at"])
                         reason = entry["reason"] or "Aucune raison"
 
                         log_entries.append(
                             f"**{action.replace('_', ' ').title()}** "
-                            f"<t:{int(created_at.timestamp())}:R>\n"
+                            f"<t:{entry['created_ts']}:R>\n"
                             f"└─ {reason}"
                         )
 
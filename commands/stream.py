@@ -23,10 +23,38 @@ SERVER_ID = int(os.getenv("server_id", "0"))
 TWITCH_CLIENT_ID = os.getenv("twitch_client_id")
 TWITCH_CLIENT_SECRET = os.getenv("twitch_client_secret")
 
+# Cache nom du streamer -> ID du rôle à mentionner (None si aucun rôle),
+# invalidé par stream_add / stream_remove
+_role_id_cache: dict[str, Optional[int]] = {}
+
 
 class Stream(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # Copie en mémoire de la table streamers (id -> ligne), utilisée par la
+        # boucle de vérification pour ne pas relire la base à chaque passage
+        self._streamers: dict[int, dict] = {}
+
+    async def cog_load(self):
+        self._load_streamers()
+
+    def _load_streamers(self):
+        """Charger la table streamers en mémoire."""
+        conn = database.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, streamerName, streamChannelId, roleId, announced "
+                "FROM streamers"
+            )
+            self._streamers = {row["id"]: dict(row) for row in cursor.fetchall()}
+        finally:
+            conn.close()
+        logger.debug(f"{len(self._streamers)} streamer(s) chargé(s) en mémoire")
+
+    def get_streamers(self) -> list[tuple[int, dict]]:
+        """Retourner la liste des streamers suivis sous forme (id, ligne)."""
+        return list(self._streamers.items())
 
     @app_commands.command(
         name="stream_add", description="Ajouter un streamer à la liste des streamers."
@@ -98,8 +126,17 @@ class Stream(commands.Cog):
                     ),
                 )
                 conn.commit()
+                streamer_id = cursor.lastrowid
             finally:
                 conn.close()
+            self._streamers[streamer_id] = {
+                "id": streamer_id,
+                "streamerName": streamer_name,
+                "streamChannelId": str(channel.id),
+                "roleId": str(ping_role.id) if ping_role else None,
+                "announced": 0,
+            }
+            _role_id_cache.pop(streamer_name, None)
             
             # Envoyer un message de confirmation
             await interaction.response.send_message(
@@ -115,22 +152,6 @@ class Stream(commands.Cog):
                 f"❌ Erreur lors de l'ajout du streamer: {str(e)}", ephemeral=True
             )
 
-    async def check_streams(self):
-        """Vérifier le statut de tous les streamers dans la base de données."""
-        try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM streamers")
-            streamers = cursor.fetchall()
-            conn.close()
-
-            for streamer in streamers:
-                # Logique de vérification du stream
-                # Cette méthode sera appelée périodiquement
-                pass
-        except Exception as e:
-            logger.error(f"Erreur lors de la vérification des streams: {e}")
-
     @app_commands.command(
         name="stream_remove",
         description="Retirer un streamer de la liste des streamers.",
@@ -158,6 +179,12 @@ class Stream(commands.Cog):
                 conn.commit()
             finally:
                 conn.close()
+            self._streamers = {
+                streamer_id: streamer
+                for streamer_id, streamer in self._streamers.items()
+                if streamer["streamerName"] != streamer_name
+            }
+            _role_id_cache.pop(streamer_name, None)
             
             if rows_deleted > 0:
                 await interaction.response.send_message(
@@ -223,28 +250,6 @@ class GetTwitchOAuth:
         raise Exception(f"Échec de l'authentification Twitch après {retry_count} tentatives: {last_error}")
 
 
-class StartStreamCheckInterval:
-    """Classe pour démarrer un intervalle de vérification des streamers."""
-
-    def __init__(self, bot: commands.Bot, interval: int = 60):
-        self.bot = bot
-        self.interval = interval
-        self.check_task = None
-
-    async def start_check(self):
-        """Démarrer la tâche de vérification des streamers."""
-        if self.check_task is not None:
-            return  # La tâche est déjà en cours
-
-        self.check_task = self.bot.loop.create_task(self.check_streamers())
-
-    async def check_streamers(self):
-        """Vérifier régulièrement le statut des streamers."""
-        while True:
-            # Logique pour vérifier les streamers
-            await asyncio.sleep(self.interval)
-
-
 class CheckTwitchStatus:
     """Classe pour vérifier le statut des streamers sur Twitch."""
 
@@ -295,16 +300,26 @@ class AnnounceStream:
 
     async def get_role(self, streamer_name: str):
         """Récupérer le rôle à mentionner pour les annonces."""
-        conn = database.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT roleId FROM streamers WHERE streamerName = ?", (streamer_name,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        if result and result[0]:
-            return discord.utils.get(self.bot.guilds[0].roles, id=int(result[0]))
-        return None
+        if streamer_name not in _role_id_cache:
+            conn = database.get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT roleId FROM streamers WHERE streamerName = ?",
+                    (streamer_name,),
+                )
+                result = cursor.fetchone()
+            finally:
+                conn.close()
+            _role_id_cache[streamer_name] = (
+                int(result[0]) if result and result[0] else None
+            )
+
+        role_id = _role_id_cache[streamer_name]
+        if role_id is None:
+            return None
+        guild = self.bot.get_guild(SERVER_ID) or self.bot.guilds[0]
+        return guild.get_role(role_id)
 
     async def announce(
         self,
@@ -3,8 +3,10 @@ User moderation commands for ISROBOT.
 Allows users to appeal warnings.
 """
 
+import asyncio
 import logging
 import os
+import re
 from datetime import datetime, timezone
 
 import discord
@@ -19,6 +21,16 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 SERVER_ID = int(os.getenv("server_id", "0"))
 
+# Keep references to pending DM sends so they are not garbage collected
+_dm_tasks: set = set()
+
+
+def _send_dm_in_background(member: discord.Member, embed: discord.Embed) -> None:
+    """Send a DM without making the caller wait for Discord's answer."""
+    task = asyncio.create_task(moderation_utils.send_dm_notification(member, embed))
+    _dm_tasks.add(task)
+    task.add_done_callback(_dm_tasks.discard)
+
 
 class UserModeration(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -33,6 +45,7 @@ class UserModeration(commands.Cog):
     async def appeal(self, interaction: discord.Interaction, reason: str):
         """Submit an appeal against warnings."""
         await interaction.response.defer(ephemeral=True)
+        now = datetime.now(timezone.utc)
 
         try:
             guild_id = str(interaction.guild.id)
@@ -82,7 +95,7 @@ class UserModeration(commands.Cog):
                 title="✅ Appel soumis",
                 description="Votre appel a été soumis aux modérateurs.",
                 color=discord.Color.green(),
-                timestamp=datetime.now(timezone.utc)
+                timestamp=now
             )
             embed.add_field(name="Raison", value=reason, inline=False)
             embed.add_field(
@@ -104,7 +117,8 @@ class UserModeration(commands.Cog):
                     appeal_id,
                     interaction.user,
                     warn_count,
-                    reason
+                    reason,
+                    now
                 )
 
         except Exception as e:
@@ -121,7 +135,8 @@ class UserModeration(commands.Cog):
         appeal_id: int,
         user: discord.Member,
         warn_count: int,
-        reason: str
+        reason: str,
+        now: datetime
     ):
         """Post an appeal to the appeal review channel."""
         try:
@@ -134,7 +149,7 @@ class UserModeration(commands.Cog):
                 title=f"📝 Nouvel appel - ID #{appeal_id}",
                 description=f"**Utilisateur:** {user.mention} ({user.id})",
                 color=discord.Color.purple(),
-                timestamp=datetime.now(timezone.utc)
+                timestamp=now
             )
 
             embed.add_field(
@@ -150,15 +165,16 @@ class UserModeration(commands.Cog):
             )
 
             # Get user history
-            history = moderation_utils.get_warning_history(str(guild.id), str(user.id))
+            history = moderation_utils.get_warning_history(
+                str(guild.id), str(user.id), limit=5
+            )
             if history:
                 recent_history = []
-                for entry in history[:5]:
+                for entry in history:
                     action = entry["action"]
-                    created_at = datetime.fromisoformat(entry["created_at"])
                     recent_history.append(
                         f"• {action.replace('_', ' ').title()} "
-                        f"<t:{int(created_at.timestamp())}:R>"
+                        f"<t:{entry['created_ts']}:R>"
                     )
                 embed.add_field(
                     name="Historique récent",
@@ -169,166 +185,204 @@ class UserModeration(commands.Cog):
             embed.set_footer(text="Utilisez les boutons ci-dessous pour examiner l'appel")
 
             # Create view with buttons
-            view = AppealReviewView(appeal_id, user.id, self.bot)
+            view = AppealReviewView(appeal_id, user.id)
             await channel.send(embed=embed, view=view)
 
         except Exception as e:
             logger.error(f"Error posting appeal to channel: {e}")
 
 
-class AppealReviewView(discord.ui.View):
-    """View with buttons to review an appeal."""
-
-    def __init__(self, appeal_id: int, user_id: int, bot: commands.Bot):
-        super().__init__(timeout=None)
-        self.appeal_id = appeal_id
-        self.user_id = user_id
-        self.bot = bot
-
-    @discord.ui.button(
-        label="✅ Approuver",
-        style=discord.ButtonStyle.success,
-        custom_id="appeal_approve"
-    )
-    async def approve_button(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ):
-        """Approve the appeal."""
-        await self._handle_appeal_decision(interaction, "approved", "Appel approuvé par le modérateur")
+async def _handle_appeal_decision(
+    interaction: discord.Interaction,
+    appeal_id: int,
+    user_id: int,
+    decision: str,
+    moderator_decision: str,
+    view: discord.ui.View
+):
+    """Handle the appeal decision and disable the buttons of ``view``."""
+    await interaction.response.defer(ephemeral=True)
+    now = datetime.now(timezone.utc)
+
+    try:
+        # Check permissions
+        if not interaction.user.guild_permissions.moderate_members:
+            await interaction.followup.send(
+                "❌ Vous n'avez pas la permission de gérer les appels.",
+                ephemeral=True
+            )
+            return
 
-    @discord.ui.button(
-        label="❌ Refuser",
-        style=discord.ButtonStyle.danger,
-        custom_id="appeal_deny"
-    )
-    async def deny_button(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ):
-        """Deny the appeal."""
-        # Show modal for reason
-        modal = AppealDecisionModal(self.appeal_id, self.user_id, "denied", self.bot)
-        await interaction.response.send_modal(modal)
+        # Review appeal
+        success = moderation_utils.review_appeal(
+            appeal_id,
+            str(interaction.user.id),
+            decision,
+            moderator_decision
+        )
 
-    async def _handle_appeal_decision(
-        self, interaction: discord.Interaction, decision: str, moderator_decision: str
-    ):
-        """Handle the appeal decision."""
-        await interaction.response.defer(ephemeral=True)
+        if not success:
+            await interaction.followup.send(
+                "❌ Appel introuvable.",
+                ephemeral=True
+            )
+            return
 
-        try:
-            # Check permissions
-            if not interaction.user.guild_permissions.moderate_members:
-                await interaction.followup.send(
-                    "❌ Vous n'avez pas la permission de gérer les appels.",
-                    ephemeral=True
-                )
-                return
+        # If approved, remove one warning
+        guild_id = str(interaction.guild.id)
+        user_id = str(user_id)
+        new_count = None
 
-            # Review appeal
-            success = moderation_utils.review_appeal(
-                self.appeal_id,
+        if decision == "approved":
+            new_count = moderation_utils.decrement_warning(
+                guild_id,
+                user_id,
                 str(interaction.user.id),
-                decision,
-                moderator_decision
+                "Appel approuvé"
             )
 
-            if not success:
-                await interaction.followup.send(
-                    "❌ Appel introuvable.",
-                    ephemeral=True
-                )
-                return
-
-            # If approved, remove one warning
-            guild_id = str(interaction.guild.id)
-            user_id = str(self.user_id)
+            # If warnings reach 0, remove mute
+            if new_count == 0:
+                member = interaction.guild.get_member(int(user_id))
+                if member:
+                    try:
+                        await member.timeout(None, reason="Appel approuvé - avertissements = 0")
+                        moderation_utils.remove_mute(
+                            guild_id,
+                            user_id,
+                            str(interaction.user.id),
+                            "Appel approuvé"
+                        )
+                    except Exception as e:
+                        logger.error(f"Error removing timeout: {e}")
+
+        # Send DM to user
+        member = interaction.guild.get_member(int(user_id))
+        if member:
+            embed = discord.Embed(
+                title=f"{'✅ Appel approuvé' if decision == 'approved' else '❌ Appel refusé'}",
+                description=f"Votre appel sur **{interaction.guild.name}** a été examiné.",
+                color=discord.Color.green() if decision == "approved" else discord.Color.red(),
+                timestamp=now
+            )
+            embed.add_field(
+                name="Décision du modérateur",
+                value=moderator_decision,
+                inline=False
+            )
 
             if decision == "approved":
-                new_count = moderation_utils.decrement_warning(
-                    guild_id,
-                    user_id,
-                    str(interaction.user.id),
-                    "Appel approuvé"
+                # new_count comes from decrement_warning above
+                embed.add_field(
+                    name="Nouveaux avertissements",
+                    value=str(new_count),
+                    inline=True
                 )
-
-                # If warnings reach 0, remove mute
-                if new_count == 0:
-                    member = interaction.guild.get_member(int(user_id))
-                    if member:
-                        try:
-                            await member.timeout(None, reason="Appel approuvé - avertissements = 0")
-                            moderation_utils.remove_mute(
-                                guild_id,
-                                user_id,
-                                str(interaction.user.id),
-                                "Appel approuvé"
-                            )
-                        except Exception as e:
-                            logger.error(f"Error removing timeout: {e}")
-
-            # Send DM to user
-            member = interaction.guild.get_member(int(user_id))
-            if member:
-                embed = discord.Embed(
-                    title=f"{'✅ Appel approuvé' if decision == 'approved' else '❌ Appel refusé'}",
-                    description=f"Votre appel sur **{interaction.guild.name}** a été examiné.",
-                    color=discord.Color.green() if decision == "approved" else discord.Color.red(),
-                    timestamp=datetime.now(timezone.utc)
+                embed.add_field(
+                    name="Message",
+                    value="Un avertissement a été retiré. Continuez à respecter les règles!",
+                    inline=False
                 )
+            else:
                 embed.add_field(
-                    name="Décision du modérateur",
-                    value=moderator_decision,
+                    name="Prochaines étapes",
+                    value="Si vous n'êtes pas d'accord avec cette décision, "
+                          "vous pouvez contacter un administrateur.",
                     inline=False
                 )
 
-                if decision == "approved":
-                    new_count = moderation_utils.get_warning_count(guild_id, user_id)
-                    embed.add_field(
-                        name="Nouveaux avertissements",
-                        value=str(new_count),
-                        inline=True
-                    )
-                    embed.add_field(
-                        name="Message",
-                        value="Un avertissement a été retiré. Continuez à respecter les règles!",
-                        inline=False
-                    )
-                else:
-                    embed.add_field(
-                        name="Prochaines étapes",
-                        value="Si vous n'êtes pas d'accord avec cette décision, "
-                              "vous pouvez contacter un administrateur.",
-                        inline=False
-                    )
-
-                embed.set_footer(text="Système de modération ISROBOT")
-                await moderation_utils.send_dm_notification(member, embed)
+            embed.set_footer(text="Système de modération ISROBOT")
+            # send_dm_notification already handles its errors: send the DM in
+            # the background so the moderator's response is not delayed
+            _send_dm_in_background(member, embed)
+
+        # Update the message
+        for item in view.children:
+            item.disabled = True
+
+        original_embed = interaction.message.embeds[0]
+        original_embed.color = discord.Color.green() if decision == "approved" else discord.Color.red()
+        original_embed.add_field(
+            name="Décision",
+            value=f"{'✅ Approuvé' if decision == 'approved' else '❌ Refusé'} par {interaction.user.mention}",
+            inline=False
+        )
+
+        await interaction.message.edit(embed=original_embed, view=view)
+
+        await interaction.followup.send(
+            f"✅ Appel {'approuvé' if decision == 'approved' else 'refusé'}.",
+            ephemeral=True
+        )
+
+    except Exception as e:
+        logger.error(f"Error handling appeal decision: {e}")
+        await interaction.followup.send(
+            "❌ Une erreur s'est produite.",
+            ephemeral=True
+        )
+
+
+class AppealDecisionButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"appeal:(?P<action>approve|deny):(?P<appeal_id>\d+):(?P<user_id>\d+)"
+):
+    """Approve/deny button whose appeal is encoded in its custom_id.
+
+    Registered once with ``bot.add_dynamic_items`` so buttons keep working
+    after a restart without keeping one view per pending appeal in memory.
+    """
+
+    def __init__(self, action: str, appeal_id: int, user_id: int):
+        if action == "approve":
+            label, style = "✅ Approuver", discord.ButtonStyle.success
+        else:
+            label, style = "❌ Refuser", discord.ButtonStyle.danger
+        super().__init__(
+            discord.ui.Button(
+                label=label,
+                style=style,
+                custom_id=f"appeal:{action}:{appeal_id}:{user_id}"
+            )
+        )
+        self.action = action
+        self.appeal_id = appeal_id
+        self.user_id = user_id
 
-            # Update the message
-            for item in self.children:
-                item.disabled = True
+    @classmethod
+    async def from_custom_id(
+        cls,
+        interaction: discord.Interaction,
+        item: discord.ui.Button,
+        match: re.Match[str]
+    ):
+        return cls(match["action"], int(match["appeal_id"]), int(match["user_id"]))
 
-            original_embed = interaction.message.embeds[0]
-            original_embed.color = discord.Color.green() if decision == "approved" else discord.Color.red()
-            original_embed.add_field(
-                name="Décision",
-                value=f"{'✅ Approuvé' if decision == 'approved' else '❌ Refusé'} par {interaction.user.mention}",
-                inline=False
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "approve":
+            await _handle_appeal_decision(
+                interaction,
+                self.appeal_id,
+                self.user_id,
+                "approved",
+                "Appel approuvé par le modérateur",
+                self.view
+            )
+        else:
+            # Show modal for reason
+            modal = AppealDecisionModal(
+                self.appeal_id, self.user_id, "denied", self.view
             )
+            await interaction.response.send_modal(modal)
 
-            await interaction.message.edit(embed=original_embed, view=self)
 
-            await interaction.followup.send(
-                f"✅ Appel {'approuvé' if decision == 'approved' else 'refusé'}.",
-                ephemeral=True
-            )
+class AppealReviewView(discord.ui.View):
+    """View with buttons to review an appeal."""
 
-        except Exception as e:
-            logger.error(f"Error handling appeal decision: {e}")
-            await interaction.followup.send(
-                "❌ Une erreur s'est produite.",
-                ephemeral=True
-            )
+    def __init__(self, appeal_id: int, user_id: int):
+        super().__init__(timeout=None)
+        self.add_item(AppealDecisionButton("approve", appeal_id, user_id))
+        self.add_item(AppealDecisionButton("deny", appeal_id, user_id))
 
 
 class AppealDecisionModal(discord.ui.Modal, title="Refuser l'appel"):
@@ -342,21 +396,34 @@ class AppealDecisionModal(discord.ui.Modal, title="Refuser l'appel"):
         max_length=500
     )
 
-    def __init__(self, appeal_id: int, user_id: int, decision: str, bot: commands.Bot):
+    def __init__(
+        self,
+        appeal_id: int,
+        user_id: int,
+        decision: str,
+        review_view: discord.ui.View
+    ):
         super().__init__()
         self.appeal_id = appeal_id
         self.user_id = user_id
         self.decision = decision
-        self.bot = bot
+        self.review_view = review_view
 
     async def on_submit(self, interaction: discord.Interaction):
         """Handle modal submission."""
         moderator_decision = self.decision_reason.value
 
-        # Find the view and call the handler
-        view = AppealReviewView(self.appeal_id, self.user_id, self.bot)
-        await view._handle_appeal_decision(interaction, self.decision, moderator_decision)
+        # Reuse the review view the modal was opened from
+        await _handle_appeal_decision(
+            interaction,
+            self.appeal_id,
+            self.user_id,
+            self.decision,
+            moderator_decision,
+            self.review_view
+        )
 
 
 async def setup(bot: commands.Bot):
+    bot.add_dynamic_items(AppealDecisionButton)
     await bot.add_cog(UserModeration(bot))
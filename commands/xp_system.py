@@ -1,13 +1,20 @@
+import asyncio
+import bisect
 import math
 import os
 import random
 import sqlite3
+import threading
+import time
+from typing import Dict, Set, Tuple
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
 
+import database
+import db_helpers
 from utils.logging_config import get_logger
 
 # Chargement du fichier .env
@@ -18,92 +25,236 @@ logger = get_logger(__name__)
 
 # Récupération des variables d'environnement
 SERVER_ID = int(os.getenv("server_id", "0"))
-DB_PATH = os.getenv("db_path")
 
 # Configuration du système d'XP
 LEVEL_MULTIPLIER = 125  # Multiplicateur pour calculer l'XP nécessaire par niveau
+XP_COOLDOWN = 60  # Secondes minimum entre deux gains d'XP par message
+XP_FLUSH_INTERVAL = 10  # Secondes entre deux écritures groupées de l'XP en base
+XP_FLUSH_MAX_DIRTY = 100  # Écriture anticipée au-delà de ce nombre d'utilisateurs
+XP_CACHE_IDLE = 600  # Secondes sans gain avant de retirer des stats du cache
+
+# XP minimale de chaque niveau (index = niveau - 1), précalculée une fois
+_MAX_PRECOMPUTED_LEVEL = 1000
+_THRESHOLDS = [
+    ((level - 1) ** 2) * LEVEL_MULTIPLIER
+    for level in range(1, _MAX_PRECOMPUTED_LEVEL + 1)
+]
+
+# Préfixes des 10 lignes du classement
+_MEDALS = ("🥇", "🥈", "🥉") + ("🏅",) * 7
+
+# Générateur dédié aux gains d'XP
+_xp_rng = random.Random()
+
+# Requêtes SQL du cog, partagées pour profiter du cache de requêtes préparées.
+# Les IDs Discord sont liés en int : l'affinité TEXT des colonnes guildId/userId
+# les convertit côté SQLite, sans allouer de chaîne côté Python.
+_SEL_SQL = "SELECT xp, level, messages FROM users WHERE guildId = ? AND userId = ?"
+# Le niveau est recalculé par SQLite à partir de l'XP finale : les
+# modifications faites entre-temps par d'autres modules (boutique, vocal) sont
+# prises en compte.
+_UPSERT_SQL = (
+    "INSERT INTO users (guildId, userId, xp, level, messages, coins) "
+    "VALUES (?1, ?2, ?3, xp_level(?3), ?4, 0) "
+    "ON CONFLICT(guildId, userId) DO UPDATE SET "
+    "xp = xp + excluded.xp, level = xp_level(xp + excluded.xp), "
+    "messages = messages + excluded.messages"
+)
+_LEADERBOARD_SQL = (
+    "SELECT userId, xp, level, messages FROM users "
+    "WHERE guildId = ? ORDER BY xp DESC LIMIT 10"
+)
 
 
 class XPSystem(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.user_cooldowns = {}  # Cooldown pour éviter le spam d'XP
-
-    def get_db_connection(self):
-        """Crée une connexion à la base de données SQLite."""
-        if not DB_PATH:
-            raise ValueError("Le chemin de la base de données n'est pas défini.")
-
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
+        # Cooldown pour éviter le spam d'XP : (guild_id, user_id) -> dernier gain
+        self.user_cooldowns: Dict[Tuple[int, int], float] = {}
+        # Stats connues par (guild_id, user_id), chargées à la première utilisation
+        self._xp_cache: Dict[Tuple[int, int], dict] = {}
+        # Dernière utilisation des stats en cache (horloge monotone)
+        self._xp_cache_used: Dict[Tuple[int, int], float] = {}
+        # Gains en attente d'écriture : (guild_id, user_id) -> [xp, messages]
+        self._dirty: Dict[Tuple[int, int], list] = {}
+        # Utilisateurs dont la ligne a été modifiée par un autre module : leurs
+        # stats en cache sont relues avant le prochain gain
+        self._stale: Set[Tuple[int, int]] = set()
+        # Sérialise les écritures groupées et les lectures de stats, pour qu'une
+        # lecture ne tombe jamais entre la prise des gains et leur écriture
+        self._flush_lock = asyncio.Lock()
+        # Connexion unique réutilisée par le cog, protégée par un verrou.
+        # Lignes renvoyées en tuples : colonnes lues par position
+        self.conn = database.get_persistent_connection(row_factory=None)
+        self.conn.create_function(
+            "xp_level", 1, self.calculate_level_from_xp, deterministic=True
+        )
+        self._db_lock = threading.Lock()
+        db_helpers.register_xp_listener(self._on_xp_changed)
+        self.flush_xp_loop.start()
+
+    async def cog_unload(self):
+        # Arrêter la boucle et écrire les gains encore en mémoire
+        self.flush_xp_loop.cancel()
+        db_helpers.unregister_xp_listener(self._on_xp_changed)
+        await self.flush_xp()
+        # Attendre une écriture éventuellement encore en cours dans un thread
+        # (boucle annulée pendant un flush) avant de fermer la connexion
+        await asyncio.to_thread(self._close_conn)
+
+    def _close_conn(self):
+        """Ferme la connexion du cog une fois libérée (appelée dans un thread)."""
+        with self._db_lock:
+            self.conn.close()
+
+    def _on_xp_changed(self, guild_id, user_id):
+        """Marque comme périmées les stats en cache d'un utilisateur (tout thread)."""
+        try:
+            key = (int(guild_id), int(user_id))
+        except (TypeError, ValueError):
+            return
+        self._stale.add(key)
 
     def calculate_level_from_xp(self, xp):
         """Calcule le niveau basé sur l'XP."""
+        if xp < _THRESHOLDS[-1]:
+            return bisect.bisect_right(_THRESHOLDS, xp)
         return int(math.sqrt(xp / LEVEL_MULTIPLIER)) + 1
 
     def calculate_xp_for_level(self, level):
         """Calcule l'XP nécessaire pour atteindre un niveau donné."""
+        if 1 <= level <= _MAX_PRECOMPUTED_LEVEL:
+            return _THRESHOLDS[level - 1]
         return ((level - 1) ** 2) * LEVEL_MULTIPLIER
 
-    def add_user_xp(self, guild_id, user_id, xp_gain):
-        """Ajoute de l'XP à un utilisateur et met à jour son niveau."""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+    def _fetch(self, sql, params, one=True):
+        """Exécute une lecture sur la connexion du cog (appelée dans un thread)."""
+        with self._db_lock:
+            cursor = self.conn.execute(sql, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+
+    async def _get_cached_stats(self, guild_id, user_id):
+        """Retourne les stats en mémoire d'un utilisateur, en les lisant si besoin."""
+        key = (guild_id, user_id)
+        if key in self._stale:
+            # Ligne modifiée par un autre module : relire la valeur en base
+            self._stale.discard(key)
+            self._xp_cache.pop(key, None)
+        stats = self._xp_cache.get(key)
+        if stats is None:
+            async with self._flush_lock:
+                result = await asyncio.to_thread(self._fetch, _SEL_SQL, key)
+                xp, _, messages = result if result else (0, 1, 0)
+                # Ajouter les gains pas encore écrits en base
+                pending = self._dirty.get(key)
+                if pending:
+                    xp += pending[0]
+                    messages += pending[1]
+                stats = {
+                    "xp": xp,
+                    "level": self.calculate_level_from_xp(xp),
+                    "messages": messages,
+                }
+                # Un autre message a pu charger l'utilisateur pendant la lecture
+                stats = self._xp_cache.setdefault(key, stats)
+        self._xp_cache_used[key] = time.monotonic()
+        return stats
+
+    async def add_user_xp(self, guild_id, user_id, xp_gain):
+        """Ajoute de l'XP à un utilisateur et met à jour son niveau.
+
+        Les gains sont accumulés en mémoire et écrits en base par flush_xp().
+        """
+        stats = await self._get_cached_stats(guild_id, user_id)
+
+        old_level = stats["level"]
+        stats["xp"] += xp_gain
+        stats["messages"] += 1
+        stats["level"] = self.calculate_level_from_xp(stats["xp"])
+
+        pending = self._dirty.setdefault((guild_id, user_id), [0, 0])
+        pending[0] += xp_gain
+        pending[1] += 1
+
+        result = {
+            "new_xp": stats["xp"],
+            "new_level": stats["level"],
+            "level_up": stats["level"] > old_level,
+            "messages": stats["messages"],
+        }
+
+        if len(self._dirty) >= XP_FLUSH_MAX_DIRTY:
+            await self.flush_xp()
 
-        # Vérifier si l'utilisateur existe
-        cursor.execute(
-            "SELECT xp, level, messages FROM users WHERE guildId = ? AND userId = ?",
-            (str(guild_id), str(user_id)),
-        )
-        result = cursor.fetchone()
-
-        if result:
-            # L'utilisateur existe, on met à jour ses stats
-            old_xp = result["xp"]
-            old_level = result["level"]
-            old_messages = result["messages"]
-
-            new_xp = old_xp + xp_gain
-            new_level = self.calculate_level_from_xp(new_xp)
-            new_messages = old_messages + 1
-
-            cursor.execute(
-                """
-                UPDATE users
-                SET xp = ?, level = ?, messages = ?
-                WHERE guildId = ? AND userId = ?
-            """,
-                (new_xp, new_level, new_messages, str(guild_id), str(user_id)),
-            )
+        return result
 
-            level_up = new_level > old_level
-        else:
-            # L'utilisateur n'existe pas, on le crée
-            new_xp = xp_gain
-            new_level = self.calculate_level_from_xp(new_xp)
-            new_messages = 1
-
-            cursor.execute(
-                """
-                INSERT INTO users (guildId, userId, xp, level, messages, coins, corners)
-                VALUES (?, ?, ?, ?, ?, 0, 0)
-            """,
-                (str(guild_id), str(user_id), new_xp, new_level, new_messages),
-            )
+    def _write_xp_rows(self, rows):
+        """Applique les UPSERT d'XP en une transaction (appelée dans un thread)."""
+        with self._db_lock:
+            with self.conn:
+                self.conn.executemany(_UPSERT_SQL, rows)
+
+    async def flush_xp(self):
+        """Écrit en base, en une seule transaction, les gains d'XP en attente."""
+        async with self._flush_lock:
+            await self._flush_dirty()
+
+    async def _flush_dirty(self):
+        if not self._dirty:
+            return
 
-            level_up = new_level > 1
+        # La prise des gains en attente se fait sur la boucle asyncio : seule
+        # l'écriture SQLite part dans un thread
+        dirty, self._dirty = self._dirty, {}
+        # Un seul UPSERT par utilisateur : création de la ligne si besoin, sinon
+        # application des incréments (et non de valeurs absolues, pour ne pas
+        # écraser l'XP ajoutée entre-temps par d'autres modules)
+        rows = [
+            (guild_id, user_id, xp_gain, messages_gain)
+            for (guild_id, user_id), (xp_gain, messages_gain) in dirty.items()
+        ]
 
-        conn.commit()
-        conn.close()
+        try:
+            await asyncio.to_thread(self._write_xp_rows, rows)
+        except sqlite3.Error as e:
+            # Remettre les gains en attente pour la prochaine tentative
+            for key, (xp_gain, messages_gain) in dirty.items():
+                pending = self._dirty.setdefault(key, [0, 0])
+                pending[0] += xp_gain
+                pending[1] += messages_gain
+            logger.error(f"Erreur lors de l'écriture groupée de l'XP: {e}")
+            return
 
-        return {
-            "new_xp": new_xp,
-            "new_level": new_level,
-            "level_up": level_up,
-            "messages": new_messages,
+        # Les stats restent en cache : les écritures des autres modules sont
+        # signalées par _on_xp_changed
+        logger.debug(f"XP écrite en base pour {len(rows)} utilisateur(s)")
+
+    def prune_cooldowns(self):
+        """Supprime les cooldowns expirés pour borner la mémoire utilisée."""
+        now = time.monotonic()
+        self.user_cooldowns = {
+            key: last
+            for key, last in self.user_cooldowns.items()
+            if now - last < XP_COOLDOWN
         }
 
+    def prune_xp_cache(self):
+        """Retire du cache les stats des utilisateurs inactifs depuis XP_CACHE_IDLE."""
+        now = time.monotonic()
+        for key, last in list(self._xp_cache_used.items()):
+            # Les gains pas encore écrits restent comptés dans les stats en cache
+            if now - last >= XP_CACHE_IDLE and key not in self._dirty:
+                del self._xp_cache_used[key]
+                self._xp_cache.pop(key, None)
+
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    async def flush_xp_loop(self):
+        await self.flush_xp()
+        self.prune_cooldowns()
+        self.prune_xp_cache()
+        # Les utilisateurs sans stats en cache n'ont rien à relire
+        self._stale.intersection_update(self._xp_cache)
+
     @commands.Cog.listener()
     async def on_message(self, message):
         """Écoute les messages et ajoute de l'XP."""
@@ -123,19 +274,19 @@ class XPSystem(commands.Cog):
         guild_id = message.guild.id
 
         # Système de cooldown pour éviter le spam (1 minute)
-        cooldown_key = f"{guild_id}_{user_id}"
-        current_time = discord.utils.utcnow().timestamp()
-
-        if cooldown_key in self.user_cooldowns:
-            if current_time - self.user_cooldowns[cooldown_key] < 60:  # 60 secondes
-                return
+        cooldown_key = (guild_id, user_id)
+        # Horloge monotone : pas d'objet datetime et insensible aux changements d'heure
+        current_time = time.monotonic()
 
+        last = self.user_cooldowns.get(cooldown_key)
+        if last is not None and current_time - last < XP_COOLDOWN:
+            return
         self.user_cooldowns[cooldown_key] = current_time
 
         # Ajouter de l'XP
-        xp_gain = random.randint(15, 25)
+        xp_gain = _xp_rng.randrange(15, 26)
         try:
-            result = self.add_user_xp(guild_id, user_id, xp_gain)
+            result = await self.add_user_xp(guild_id, user_id, xp_gain)
 
             # Si l'utilisateur a level up, envoyer un message privé à l'utilisateur
             if result["level_up"]:
@@ -170,15 +321,9 @@ class XPSystem(commands.Cog):
         """Affiche le niveau et l'XP d'un utilisateur."""
         target_user = user or interaction.user
 
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT xp, level, messages FROM users WHERE guildId = ? AND userId = ?",
-            (str(interaction.guild.id), str(target_user.id)),
+        result = await asyncio.to_thread(
+            self._fetch, _SEL_SQL, (interaction.guild.id, target_user.id)
         )
-        result = cursor.fetchone()
-        conn.close()
 
         if not result:
             if target_user == interaction.user:
@@ -192,9 +337,7 @@ class XPSystem(commands.Cog):
                 )
             return
 
-        current_xp = result["xp"]
-        current_level = result["level"]
-        messages = result["messages"]
+        current_xp, current_level, messages = result
 
         # Calculer l'XP nécessaire pour le niveau suivant
         xp_for_current_level = self.calculate_xp_for_level(current_level)
@@ -237,23 +380,10 @@ class XPSystem(commands.Cog):
     @app_commands.guilds(discord.Object(id=SERVER_ID))
     async def leaderboard(self, interaction: discord.Interaction):
         """Affiche le leaderboard des niveaux."""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            SELECT userId, xp, level, messages
-            FROM users
-            WHERE guildId = ?
-            ORDER BY xp DESC
-            LIMIT 10
-        """,
-            (str(interaction.guild.id),),
+        results = await asyncio.to_thread(
+            self._fetch, _LEADERBOARD_SQL, (interaction.guild.id,), False
         )
 
-        results = cursor.fetchall()
-        conn.close()
-
         if not results:
             await interaction.response.send_message(
                 "Aucun utilisateur trouvé dans le classement !", ephemeral=True
@@ -264,27 +394,21 @@ class XPSystem(commands.Cog):
             title="🏆 Classement des niveaux", color=discord.Color.gold()
         )
 
-        medals = ["🥇", "🥈", "🥉"] + ["🏅"] * 7
-
-        leaderboard_text = ""
-        for i, row in enumerate(results):
+        guild = interaction.guild
+        parts = []
+        for i, (user_id, xp, level, messages) in enumerate(results):
             # Essayer de récupérer l'utilisateur dans le serveur
-            if interaction.guild:
-                user = interaction.guild.get_member(int(row["userId"]))
-            else:
-                user = None
+            user = guild.get_member(int(user_id)) if guild else None
 
-            if user:
-                # L'utilisateur est dans le serveur
-                user_name = user.display_name
-            else:
-                # L'utilisateur n'est plus dans le serveur, utiliser son mention
-                user_name = f"<@{row['userId']}>"
+            # S'il n'est plus dans le serveur, utiliser sa mention
+            user_name = user.display_name if user else f"<@{user_id}>"
 
-            leaderboard_text += f"{medals[i]} **{user_name}**\n"
-            leaderboard_text += f"   Niveau {row['level']} • {row['xp']} XP • {row['messages']} messages\n\n"
+            parts.append(
+                f"{_MEDALS[i]} **{user_name}**\n"
+                f"   Niveau {level} • {xp} XP • {messages} messages"
+            )
 
-        embed.description = leaderboard_text
+        embed.description = "\n\n".join(parts)
         await interaction.response.send_message(embed=embed)
 
 
@@ -1,12 +1,18 @@
+import asyncio
+import heapq
 import math
 import os
 import random
-from typing import Dict, Optional, Tuple, Union
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
 
 import discord
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 
+import database
+import db_helpers
 from utils.logging_config import get_logger
 
 # Chargement du fichier .env
@@ -22,6 +28,25 @@ SERVER_ID = int(os.getenv("server_id", "0"))
 LEVEL_MULTIPLIER = 125  # Doit matcher xp_system.py
 VOICE_XP_MIN = 15  # XP min par heure en vocal
 VOICE_XP_MAX = 25  # XP max par heure en vocal
+VOICE_XP_PERIOD = 3600  # Secondes de présence en vocal par attribution
+# Délai max entre deux passages (sauvegarde des sessions)
+VOICE_TICK_MAX_INTERVAL = 900
+VOICE_RETRY_DELAY = 300  # Nouvel essai pour les membres AFK ou après une erreur
+
+# Le niveau est recalculé par SQLite à partir de l'XP finale : un seul UPSERT
+# par membre, sans relire les lignes existantes. Les IDs sont liés en int,
+# l'affinité TEXT de guildId/userId se charge de la conversion.
+_VOICE_XP_UPSERT_SQL = """
+    INSERT INTO users (guildId, userId, xp, level, messages, coins)
+    VALUES (?1, ?2, ?3, xp_level(?3), 0, 0)
+    ON CONFLICT(guildId, userId) DO UPDATE SET
+        xp = xp + excluded.xp,
+        level = xp_level(xp + excluded.xp)
+"""
+_SESSION_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO voice_sessions (guildId, userId, last_ts) VALUES (?, ?, ?)"
+)
+_SESSION_DELETE_SQL = "DELETE FROM voice_sessions WHERE guildId = ? AND userId = ?"
 
 
 class VoiceXP(commands.Cog):
@@ -29,9 +54,28 @@ class VoiceXP(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # sessions[(guild_id, user_id)] = last_award_timestamp (float, epoch seconds)
+        # sessions[(guild_id, user_id)] = last_award_timestamp (float, time.time())
         self.sessions: Dict[Tuple[int, int], float] = {}
-        # Lancer la boucle qui vérifie périodiquement et crédite l'XP (toutes les 5 minutes)
+        # Tas (échéance, clé) : la boucle ne traite que les sessions arrivées à
+        # échéance. Les entrées obsolètes (départ, nouvelle session) sont
+        # ignorées au moment où elles sortent du tas.
+        self._due: List[Tuple[float, Tuple[int, int]]] = []
+        # ID du salon AFK par serveur (None si aucun), mis à jour par on_guild_update
+        self._afk_cache: Dict[int, Optional[int]] = {}
+        # Modifications de sessions à répercuter dans voice_sessions au prochain
+        # passage : clé -> dernier timestamp d'attribution, ou None si terminée
+        self._session_changes: Dict[Tuple[int, int], Optional[float]] = {}
+        # Connexion SQLite conservée pendant toute la vie du cog
+        self._conn = database.get_persistent_connection()
+        # Transactions gérées explicitement (BEGIN IMMEDIATE / COMMIT)
+        self._conn.isolation_level = None
+        self._conn.create_function(
+            "xp_level", 1, self.calculate_level_from_xp, deterministic=True
+        )
+        self._db_lock = asyncio.Lock()
+        self._tick_lock = asyncio.Lock()
+        # Lancer la boucle qui crédite l'XP (au plus tard toutes les 15 minutes,
+        # plus tôt si une session arrive à échéance avant)
         self.voice_award_loop.start()
 
     async def cog_unload(self):
@@ -40,69 +84,122 @@ class VoiceXP(commands.Cog):
             self.voice_award_loop.cancel()
         except Exception:
             pass
+        # Sauvegarder les sessions en cours pour le prochain démarrage
+        try:
+            await self._write_tick([], {})
+        except Exception as e:
+            logger.error(f"Erreur lors de la sauvegarde des sessions vocales: {e}")
+        # Attendre une éventuelle écriture en cours avant de fermer la connexion
+        async with self._db_lock:
+            self._conn.close()
 
-    # --- Utilitaires DB & calcul de niveau ---
-    def get_db_connection(self):
-        from database import get_db_connection
-
-        return get_db_connection()
+    # --- Calcul de niveau ---
 
     def calculate_level_from_xp(self, xp: float) -> int:
         return int(math.sqrt(xp / LEVEL_MULTIPLIER)) + 1
 
-    def add_voice_xp(self, guild_id: int, user_id: int, xp_gain: int):
+    async def add_voice_xp(self, guild_id: int, user_id: int, xp_gain: int):
         """Ajoute de l'XP de voix sans incrémenter le compteur de messages."""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        if xp_gain <= 0:
+            return
+        await self.add_voice_xp_bulk([(guild_id, user_id, xp_gain)])
 
-        cursor.execute(
-            "SELECT xp, level, messages FROM users WHERE guildId = ? AND userId = ?",
-            (str(guild_id), str(user_id)),
-        )
-        result = cursor.fetchone()
-
-        if result:
-            old_xp = result["xp"]
-            old_level = result["level"]
-            messages = result["messages"]  # ne pas toucher aux messages
-
-            new_xp = old_xp + xp_gain
-            new_level = self.calculate_level_from_xp(new_xp)
-
-            cursor.execute(
-                """
-                UPDATE users
-                SET xp = ?, level = ?, messages = ?
-                WHERE guildId = ? AND userId = ?
-                """,
-                (new_xp, new_level, messages, str(guild_id), str(user_id)),
-            )
+    async def add_voice_xp_bulk(self, updates: List[Tuple[int, int, int]]):
+        """Ajoute de l'XP de voix à plusieurs membres en une seule transaction.
 
-            level_up = new_level > old_level
-        else:
-            new_xp = xp_gain
-            new_level = self.calculate_level_from_xp(new_xp)
-            messages = 0
-            cursor.execute(
-                """
-                INSERT INTO users (guildId, userId, xp, level, messages, coins, corners)
-                VALUES (?, ?, ?, ?, ?, 0, 0)
-                """,
-                (str(guild_id), str(user_id), new_xp, new_level, messages),
-            )
-            level_up = new_level > 1
+        ``updates`` contient des tuples (guild_id, user_id, xp_gain).
+        """
+        # Un gain nul ne modifie rien : inutile d'écrire la ligne
+        updates = [u for u in updates if u[2] > 0]
+        if not updates:
+            return
 
-        conn.commit()
-        conn.close()
+        async with self._db_lock:
+            await asyncio.to_thread(self._flush_xp_batch, updates)
 
-        return {
-            "new_xp": new_xp,
-            "new_level": new_level,
-            "level_up": level_up,
-            "messages": messages,
-        }
+    async def _write_tick(
+        self,
+        awards: List[Tuple[int, int, int]],
+        awarded_sessions: Dict[Tuple[int, int], float],
+    ):
+        """Écrit l'XP et les sessions modifiées d'un passage en une transaction.
+
+        ``awarded_sessions`` contient les nouveaux timestamps des sessions
+        créditées, qui ne sont appliqués en mémoire qu'après l'écriture.
+        """
+        pending = self._session_changes
+        self._session_changes = {}
+        changes = {**pending, **awarded_sessions}
+        awards = [award for award in awards if award[2] > 0]
+        if not awards and not changes:
+            return
+
+        session_rows = [
+            (guild_id, user_id, ts)
+            for (guild_id, user_id), ts in changes.items()
+            if ts is not None
+        ]
+        ended = [key for key, ts in changes.items() if ts is None]
+        try:
+            async with self._db_lock:
+                await asyncio.to_thread(
+                    self._flush_xp_batch, awards, session_rows, ended
+                )
+        except Exception:
+            # Les modifications survenues pendant l'écriture sont plus récentes
+            for key, ts in pending.items():
+                self._session_changes.setdefault(key, ts)
+            raise
+
+    def _flush_xp_batch(
+        self,
+        rows: List[Tuple[int, int, int]],
+        session_rows: Sequence[Tuple[int, int, float]] = (),
+        ended_sessions: Sequence[Tuple[int, int]] = (),
+    ):
+        """Écrit un lot d'XP vocale dans une transaction (exécuté dans un thread)."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(_VOICE_XP_UPSERT_SQL, rows)
+            self._conn.executemany(_SESSION_UPSERT_SQL, session_rows)
+            self._conn.executemany(_SESSION_DELETE_SQL, ended_sessions)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        # Les stats mises en cache par le cog d'XP textuelle sont périmées
+        for guild_id, user_id, _ in rows:
+            db_helpers.notify_xp_changed(guild_id, user_id)
 
     # --- Gestion des états vocaux ---
+    def _afk_channel_id(self, guild: discord.Guild) -> Optional[int]:
+        """Retourne l'ID du salon AFK du serveur, depuis le cache si possible."""
+        try:
+            return self._afk_cache[guild.id]
+        except KeyError:
+            afk_id = guild.afk_channel.id if guild.afk_channel else None
+            self._afk_cache[guild.id] = afk_id
+            return afk_id
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        self._afk_cache[guild.id] = guild.afk_channel.id if guild.afk_channel else None
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        self._afk_cache[after.id] = after.afk_channel.id if after.afk_channel else None
+
+    def _start_session(self, key: Tuple[int, int], last_award_ts: float):
+        """Démarre (ou reprend) le décompte d'une session vocale."""
+        self.sessions[key] = last_award_ts
+        self._session_changes[key] = last_award_ts
+        heapq.heappush(self._due, (last_award_ts + VOICE_XP_PERIOD, key))
+
+    def _end_session(self, key: Tuple[int, int]):
+        """Termine une session vocale (retirée de la base au prochain passage)."""
+        if self.sessions.pop(key, None) is not None:
+            self._session_changes[key] = None
+
     @commands.Cog.listener()
     async def on_voice_state_update(
         self,
@@ -117,7 +214,7 @@ class VoiceXP(commands.Cog):
             return
 
         key = (member.guild.id, member.id)
-        afk_channel = member.guild.afk_channel
+        afk_id = self._afk_channel_id(member.guild)
 
         def eligible(
             channel: Optional[Union[discord.VoiceChannel, discord.StageChannel]],
@@ -125,7 +222,7 @@ class VoiceXP(commands.Cog):
         ) -> bool:
             if channel is None:
                 return False
-            if afk_channel and channel.id == afk_channel.id:
+            if channel.id == afk_id:
                 return False
             # Optionnel: ignorer les utilisateurs sourds de leur côté
             # if state.self_deaf or state.deaf:
@@ -136,87 +233,205 @@ class VoiceXP(commands.Cog):
         if eligible(after.channel, after):
             # Si on vient de rejoindre ou qu'on devient éligible, démarrer le timer d'une heure
             if key not in self.sessions:
-                self.sessions[key] = discord.utils.utcnow().timestamp()
+                self._start_session(key, time.time())
         else:
             # Si l'utilisateur quitte ou n'est plus éligible, retirer la session pour arrêter le comptage
-            if key in self.sessions:
-                del self.sessions[key]
+            self._end_session(key)
 
     # --- Boucle d'attribution périodique ---
-    @tasks.loop(minutes=5)
+    @tasks.loop(seconds=VOICE_TICK_MAX_INTERVAL)
     async def voice_award_loop(self):
-        """Toutes les 5 minutes, vérifier qui a atteint 1h (ou plus) en vocal et attribuer l'XP."""
-        if not self.sessions:
+        """Attribuer l'XP aux sessions ayant atteint 1h (ou plus)."""
+        # Ne jamais laisser deux passages se chevaucher (écriture bloquée sur le
+        # disque par exemple) : l'XP serait attribuée deux fois
+        if self._tick_lock.locked():
+            logger.warning(
+                "Passage d'attribution d'XP vocal précédent encore en cours, ignoré"
+            )
+            return
+        async with self._tick_lock:
+            try:
+                await self._award_due_sessions()
+            except Exception as e:
+                # Une erreur ne doit jamais arrêter la boucle : le passage
+                # suivant retentera
+                logger.error(f"Erreur lors du passage d'attribution d'XP vocal: {e}")
+            finally:
+                self._schedule_next_tick()
+
+    def _schedule_next_tick(self):
+        """Réveille la boucle à la prochaine échéance du tas (15 minutes au plus)."""
+        delay = VOICE_TICK_MAX_INTERVAL
+        if self._due:
+            delay = min(delay, max(self._due[0][0] - time.time(), 1.0))
+        self.voice_award_loop.change_interval(seconds=delay)
+
+    async def _save_sessions(self):
+        """Sauvegarde les sessions ouvertes ou fermées depuis le dernier passage."""
+        try:
+            await self._write_tick([], {})
+        except Exception as e:
+            # Les modifications restent en attente pour le passage suivant
+            logger.error(f"Erreur lors de la sauvegarde des sessions vocales: {e}")
+
+    async def _award_due_sessions(self):
+        """Attribue l'XP aux sessions arrivées à échéance."""
+        now_ts = time.time()
+
+        # Le sommet du tas est la prochaine échéance : rien à faire avant elle,
+        # hormis sauvegarder les sessions ouvertes ou fermées depuis le dernier passage
+        if not self._due or now_ts < self._due[0][0]:
+            await self._save_sessions()
             return
 
-        now_ts = discord.utils.utcnow().timestamp()
-        to_update: Dict[Tuple[int, int], float] = {}
+        # Ne sortir du tas que les sessions arrivées à échéance
+        due: Dict[Tuple[int, int], float] = {}
+        while self._due and self._due[0][0] <= now_ts:
+            _, key = heapq.heappop(self._due)
+            last_award_ts = self.sessions.get(key)
+            # Entrée obsolète : session terminée, ou remplacée par une plus récente
+            if last_award_ts is None or now_ts - last_award_ts < VOICE_XP_PERIOD:
+                continue
+            due[key] = last_award_ts
+
+        if not due:
+            await self._save_sessions()
+            return
 
-        # Vérifier les sessions courantes
-        for (guild_id, user_id), last_award_ts in list(self.sessions.items()):
-            # Vérifier que l'utilisateur est toujours en vocal et éligible
+        to_update: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        awards: List[Tuple[int, int, int]] = []
+        # Sessions à réexaminer au prochain passage (AFK, échec d'écriture)
+        retry: List[Tuple[int, int]] = []
+
+        # Regrouper par serveur pour ne résoudre chaque serveur qu'une fois
+        by_guild: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        for (guild_id, user_id), last_award_ts in due.items():
+            by_guild[guild_id].append((user_id, last_award_ts))
+
+        # Sessions à supprimer, appliqué une fois la vérification terminée
+        to_delete: Set[Tuple[int, int]] = set()
+        # Membres toujours en vocal hors AFK : (guild_id, user_id, last_award_ts)
+        eligible: List[Tuple[int, int, float]] = []
+
+        for guild_id, members in by_guild.items():
             guild = self.bot.get_guild(guild_id)
             if not guild:
                 # Nettoyage si le serveur n'est pas accessible
-                del self.sessions[(guild_id, user_id)]
+                to_delete.update((guild_id, user_id) for user_id, _ in members)
                 continue
 
-            member = guild.get_member(user_id)
-            if not member:
-                del self.sessions[(guild_id, user_id)]
-                continue
-
-            voice = member.voice
-            if not voice or not voice.channel:
-                del self.sessions[(guild_id, user_id)]
-                continue
+            afk_id = self._afk_channel_id(guild)
+            # Accès direct au cache des membres de discord.py (évite un appel
+            # de fonction par membre), avec repli sur l'API publique
+            members_cache = getattr(guild, "_members", None)
+            get_member = (
+                members_cache.get if members_cache is not None else guild.get_member
+            )
 
-            if guild.afk_channel and voice.channel.id == guild.afk_channel.id:
-                # AFK, pas d'XP
-                continue
+            for user_id, last_award_ts in members:
+                # Vérifier que l'utilisateur est toujours en vocal et éligible
+                member = get_member(user_id)
+                voice = member.voice if member else None
+                if not voice or not voice.channel:
+                    to_delete.add((guild_id, user_id))
+                    continue
 
-            elapsed = now_ts - last_award_ts
-            full_hours = int(elapsed // 3600)
-            if full_hours >= 1:
-                # Attribuer l'XP pour chaque heure complète passée depuis la dernière attribution
-                xp_per_hour = random.randint(VOICE_XP_MIN, VOICE_XP_MAX)
-                total_xp = xp_per_hour * full_hours
-                try:
-                    self.add_voice_xp(guild_id, user_id, total_xp)
-                except Exception as e:
-                    logger.error(
-                        f"Erreur lors de l'attribution d'XP vocal à {user_id} sur {guild_id}: {e}"
-                    )
+                if voice.channel.id == afk_id:
+                    # AFK, pas d'XP
+                    retry.append((guild_id, user_id))
                     continue
 
-                # Mettre à jour le timestamp d'attribution pour conserver la/les heure(s) restante(s)
-                new_ts = last_award_ts + (full_hours * 3600)
-                to_update[(guild_id, user_id)] = new_ts
+                eligible.append((guild_id, user_id, last_award_ts))
 
-        # Appliquer les mises à jour hors de la boucle principale pour éviter les mutations concurrentes
-        for key, new_ts in to_update.items():
-            # Toujours vérifier que la session existe encore (peut avoir été supprimée ci-dessus)
+        for key in to_delete:
+            self._end_session(key)
+
+        # Tirer en une fois l'XP horaire de tous les membres éligibles
+        xps_per_hour = random.choices(
+            range(VOICE_XP_MIN, VOICE_XP_MAX + 1), k=len(eligible)
+        )
+        for (guild_id, user_id, last_award_ts), xp_per_hour in zip(
+            eligible, xps_per_hour
+        ):
+            # Attribuer l'XP pour chaque heure complète passée depuis la dernière attribution
+            full_hours = int((now_ts - last_award_ts) // VOICE_XP_PERIOD)
+            awards.append((guild_id, user_id, xp_per_hour * full_hours))
+
+            # Nouveau timestamp d'attribution, qui conserve la/les heure(s) restante(s)
+            new_ts = last_award_ts + (full_hours * VOICE_XP_PERIOD)
+            to_update[(guild_id, user_id)] = (last_award_ts, new_ts)
+
+        # Une seule transaction pour toutes les attributions et sessions de ce passage
+        try:
+            await self._write_tick(
+                awards, {key: new_ts for key, (_, new_ts) in to_update.items()}
+            )
+        except Exception as e:
+            logger.error(
+                f"Erreur lors de l'attribution d'XP vocal à {len(awards)} membre(s): {e}"
+            )
+            retry.extend(to_update)
+            to_update = {}
+
+        for key, (last_award_ts, new_ts) in to_update.items():
+            # Ignorer les sessions terminées ou redémarrées pendant l'écriture
+            if self.sessions.get(key) == last_award_ts:
+                self._start_session(key, new_ts)
+
+        for key in retry:
             if key in self.sessions:
-                self.sessions[key] = new_ts
+                heapq.heappush(self._due, (now_ts + VOICE_RETRY_DELAY, key))
 
     @voice_award_loop.before_loop
     async def before_voice_award_loop(self):
         # Attendre que le bot soit prêt avant de démarrer la boucle
         await self.bot.wait_until_ready()
+        # Reprendre les sessions sauvegardées avant le redémarrage
+        try:
+            async with self._db_lock:
+                saved = await asyncio.to_thread(self._load_saved_sessions)
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement des sessions vocales: {e}")
+            saved = {}
         # Enregistrer les membres déjà en vocal au démarrage
+        now_ts = time.time()
         for guild in self.bot.guilds:
             if SERVER_ID and guild.id != SERVER_ID:
                 continue
-            afk = guild.afk_channel
-            now_ts = discord.utils.utcnow().timestamp()
+            afk_id = guild.afk_channel.id if guild.afk_channel else None
+            self._afk_cache[guild.id] = afk_id
             for member in guild.members:
                 if member.bot:
                     continue
                 voice = member.voice
                 if voice and voice.channel:
-                    if afk and voice.channel.id == afk.id:
+                    if voice.channel.id == afk_id:
                         continue
-                    self.sessions[(guild.id, member.id)] = now_ts
+                    key = (guild.id, member.id)
+                    self._start_session(
+                        key, self._restored_award_ts(saved.get(key), now_ts)
+                    )
+        # Les sessions sauvegardées de membres qui ne sont plus en vocal sont closes
+        for key in saved.keys() - self.sessions.keys():
+            self._session_changes[key] = None
+
+    @staticmethod
+    def _restored_award_ts(saved_ts: Optional[float], now_ts: float) -> float:
+        """Timestamp d'attribution d'une session reprise après un redémarrage.
+
+        Seule l'heure entamée est conservée : le temps passé pendant que le bot
+        était arrêté (départ et retour compris) n'est pas crédité.
+        """
+        if saved_ts is None or saved_ts >= now_ts:
+            return now_ts
+        return now_ts - ((now_ts - saved_ts) % VOICE_XP_PERIOD)
+
+    def _load_saved_sessions(self) -> Dict[Tuple[int, int], float]:
+        """Lit les sessions vocales sauvegardées (exécuté dans un thread)."""
+        rows = self._conn.execute(
+            "SELECT guildId, userId, last_ts FROM voice_sessions"
+        ).fetchall()
+        return {(int(r["guildId"]), int(r["userId"])): r["last_ts"] for r in rows}
 
 
 async def setup(bot: commands.Bot):
@@ -1,13 +1,18 @@
+import asyncio
 import logging
 import os
 import re
+import threading
+from collections import deque
 from typing import Optional
 
 import aiohttp
 import discord
+import orjson
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
+from yarl import URL
 
 import database
 
@@ -21,6 +26,72 @@ YOUTUBE_API_KEY = os.getenv("youtube_api_key")
 # Logger pour ce module
 logger = logging.getLogger(__name__)
 
+# Cache ID de chaîne YouTube -> ID du rôle à mentionner (None si aucun rôle),
+# invalidé par youtube_add / youtube_remove
+_role_id_cache: dict[str, Optional[int]] = {}
+
+# Points d'accès de l'API YouTube Data v3, analysés une seule fois
+_YT_API_BASE = URL("https://www.googleapis.com/youtube/v3")
+_YT_CHANNELS_URL = _YT_API_BASE / "channels"
+_YT_SEARCH_URL = _YT_API_BASE / "search"
+_YT_PLAYLIST_ITEMS_URL = _YT_API_BASE / "playlistItems"
+_YT_VIDEOS_URL = _YT_API_BASE / "videos"
+
+# Nombre maximal d'IDs acceptés par requête par l'API YouTube (paramètre id=)
+YOUTUBE_MAX_IDS_PER_REQUEST = 50
+# Nombre maximal de requêtes simultanées vers l'API lors d'une vérification
+YOUTUBE_MAX_CONCURRENT_REQUESTS = 10
+
+# Réponses partielles (paramètre fields=) : l'API ne renvoie que les champs
+# réellement lus par le bot
+_CHANNEL_FIELDS = "items(id,snippet/title)"
+_SEARCH_CHANNEL_FIELDS = "items(snippet/channelId)"
+_UPLOADS_PLAYLIST_FIELDS = "items(id,contentDetails/relatedPlaylists/uploads)"
+_PLAYLIST_ITEMS_FIELDS = "items(snippet(publishedAt,resourceId/videoId))"
+_VIDEO_FIELDS = (
+    "items(id,snippet(title,thumbnails/high/url),"
+    "contentDetails/duration)"
+)
+
+# Nombre maximal d'embeds par message Discord
+DISCORD_MAX_EMBEDS_PER_MESSAGE = 10
+
+# File d'envoi des annonces par salon Discord (ID du salon -> (mention, embed)),
+# vidée par une tâche par salon : les envois d'un salon restent séquentiels et
+# une limite de débit n'y bloque pas la boucle de vérification
+_send_queues: dict[int, deque] = {}
+_send_tasks: set = set()
+
+# Présentation des annonces par type de contenu :
+# (titre, libellé du lien, modèle d'URL, couleur de l'embed)
+_ANNOUNCE_KINDS = {
+    "video": (
+        "📹 Nouvelle vidéo",
+        "Regardez la vidéo ici",
+        "https://www.youtube.com/watch?v={}",
+        discord.Color.red(),
+    ),
+    "short": (
+        "🎬 Nouveau short",
+        "Regardez le short ici",
+        "https://www.youtube.com/shorts/{}",
+        discord.Color.orange(),
+    ),
+}
+
+# Durée ISO 8601 renvoyée par l'API YouTube : PT#H#M#S, PT#M#S ou PT#S
+_ISO_DURATION = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+
+def derive_uploads_playlist_id(channel_id: str) -> Optional[str]:
+    """Déduire l'ID de la playlist d'uploads d'une chaîne (UC... -> UU...).
+
+    Retourne None pour un ID non standard, qui doit passer par l'API.
+    """
+    if channel_id.startswith("UC"):
+        return "UU" + channel_id[2:]
+    return None
+
 
 def validate_youtube_identifier(identifier: str) -> tuple[bool, str]:
     """
@@ -53,6 +124,77 @@ def validate_youtube_identifier(identifier: str) -> tuple[bool, str]:
 class YouTube(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # Connexion SQLite conservée pendant toute la vie du cog (cache de
+        # pages chaud, pas d'ouverture de connexion à chaque commande)
+        self.conn = database.get_persistent_connection()
+        self._db_lock = threading.Lock()
+        # Copie en mémoire de la table youtube_channels (id -> ligne), utilisée par
+        # la boucle de vérification et les annonces pour ne pas relire la base
+        self._channels: dict[int, dict] = {}
+
+    async def cog_load(self):
+        await asyncio.to_thread(self._load_channels)
+
+    def _load_channels(self):
+        """Charger la table youtube_channels en mémoire."""
+        with self._db_lock:
+            cursor = self.conn.execute(
+                "SELECT id, channelId, channelName, discordChannelId, roleId, "
+                "lastVideoId, lastShortId, notifyVideos, notifyShorts "
+                "FROM youtube_channels"
+            )
+            self._channels = {row["id"]: dict(row) for row in cursor.fetchall()}
+        logger.debug(f"{len(self._channels)} chaîne(s) YouTube chargée(s) en mémoire")
+
+    def get_channels(self) -> list[tuple[int, dict]]:
+        """Retourner la liste des chaînes suivies sous forme (id, ligne)."""
+        return list(self._channels.items())
+
+    def get_subs(self, channel_id: str) -> list[dict]:
+        """Retourner les abonnements (salons Discord) d'une chaîne YouTube."""
+        return [
+            row for row in self._channels.values() if row["channelId"] == channel_id
+        ]
+
+    async def cog_unload(self):
+        with self._db_lock:
+            self.conn.close()
+
+    # --- Accès à la base de données ---
+
+    def _insert_channel(self, row: tuple) -> Optional[int]:
+        """Ajoute une chaîne à la liste de surveillance.
+
+        Retourne l'ID de la nouvelle ligne, ou None si la chaîne est déjà
+        surveillée dans ce salon (index unique sur channelId, discordChannelId).
+        """
+        with self._db_lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    """INSERT OR IGNORE INTO youtube_channels
+                       (channelId, channelName, discordChannelId, roleId,
+                        notifyVideos, notifyShorts, notifyLive,
+                        lastVideoId, lastShortId, lastLiveId)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    row,
+                )
+            return cursor.lastrowid if cursor.rowcount > 0 else None
+
+    def _list_channel_names(self) -> list[str]:
+        """Retourne le nom de toutes les chaînes surveillées."""
+        with self._db_lock:
+            cursor = self.conn.execute("SELECT channelName FROM youtube_channels")
+            return [r[0] for r in cursor.fetchall()]
+
+    def _delete_channel(self, channel_name: str) -> int:
+        """Retire une chaîne de la liste et retourne le nombre de lignes supprimées."""
+        with self._db_lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "DELETE FROM youtube_channels WHERE channelName = ?",
+                    (channel_name,),
+                )
+            return cursor.rowcount
 
     @app_commands.command(
         name="youtube_add",
@@ -95,80 +237,68 @@ class YouTube(commands.Cog):
         actual_channel_id = None
         channel_name = None
         try:
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                checker = CheckYouTubeChannel(session)
-
-                # Si l'entrée commence par @, c'est un handle
-                if channel_id.startswith("@"):
-                    channel_data = await checker.get_channel_by_handle(channel_id)
-                    if not channel_data:
-                        await interaction.response.send_message(
-                            f"❌ Impossible de trouver la chaîne YouTube avec le handle **{channel_id}**.\n"
-                            f"Vérifiez que le handle est correct et que la chaîne existe.\n"
-                            f"Vous pouvez aussi essayer d'utiliser l'ID de la chaîne à la place."
-                        )
-                        return
-                    # Extraire l'ID réel de la chaîne et le nom
-                    actual_channel_id = channel_data["id"]
-                    channel_name = channel_data["snippet"].get("title", channel_id)
-                else:
-                    # C'est un ID de chaîne classique
-                    actual_channel_id = channel_id
-                    channel_info = await checker.get_channel_info(channel_id)
-                    if not channel_info:
-                        await interaction.response.send_message(
-                            f"❌ Impossible de trouver cette chaîne YouTube avec l'ID **{channel_id}**.\n"
-                            f"Vérifiez l'ID de la chaîne ou utilisez le handle (ex: @nom_chaine)."
-                        )
-                        return
-                    channel_name = channel_info.get("title", channel_id)
-
-                # Vérifier si la chaîne existe déjà dans la base de données
-                conn = database.get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT * FROM youtube_channels WHERE channelId = ? AND discordChannelId = ?",
-                    (actual_channel_id, str(channel.id)),
-                )
-                result = cursor.fetchone()
-                conn.close()
+            # Session HTTP partagée du bot (keep-alive, pool de connexions)
+            checker = CheckYouTubeChannel(self.bot.session)
 
-                if result:
+            # Si l'entrée commence par @, c'est un handle
+            if channel_id.startswith("@"):
+                channel_data = await checker.get_channel_by_handle(channel_id)
+                if not channel_data:
+                    await interaction.response.send_message(
+                        f"❌ Impossible de trouver la chaîne YouTube avec le handle **{channel_id}**.\n"
+                        f"Vérifiez que le handle est correct et que la chaîne existe.\n"
+                        f"Vous pouvez aussi essayer d'utiliser l'ID de la chaîne à la place."
+                    )
+                    return
+                # Extraire l'ID réel de la chaîne et le nom
+                actual_channel_id = channel_data["id"]
+                channel_name = channel_data["snippet"].get("title", channel_id)
+            else:
+                # C'est un ID de chaîne classique
+                actual_channel_id = channel_id
+                channel_info = await checker.get_channel_info(channel_id)
+                if not channel_info:
                     await interaction.response.send_message(
-                        f"La chaîne YouTube {channel_name} est déjà dans la liste."
+                        f"❌ Impossible de trouver cette chaîne YouTube avec l'ID **{channel_id}**.\n"
+                        f"Vérifiez l'ID de la chaîne ou utilisez le handle (ex: @nom_chaine)."
                     )
                     return
+                channel_name = channel_info.get("title", channel_id)
 
-                # Initialiser les IDs de suivi pour éviter d'annoncer l'ancien contenu
-                last_video_id = None
-                last_short_id = None
+            # Initialiser les IDs de suivi pour éviter d'annoncer l'ancien contenu
+            last_video_id = None
+            last_short_id = None
 
-                # Récupérer les dernières vidéos pour initialiser les IDs de suivi
-                latest_uploads = await checker.get_latest_uploads(
-                    actual_channel_id, max_results=5
-                )
+            # Récupérer les dernières vidéos pour initialiser les IDs de suivi
+            latest_uploads = await checker.get_latest_uploads(
+                actual_channel_id, max_results=5
+            )
 
-                # Parcourir les uploads récents pour trouver la dernière vidéo et le dernier short
-                for upload in latest_uploads:
-                    video_id = upload["snippet"]["resourceId"]["videoId"]
-                    video_details = await checker.get_video_details(video_id)
+            # Détails de tous les uploads récents en une seule requête
+            videos_details = await checker.get_videos_details(
+                [upload["snippet"]["resourceId"]["videoId"] for upload in latest_uploads]
+            )
+
+            # Parcourir les uploads récents pour trouver la dernière vidéo et le dernier short
+            for upload in latest_uploads:
+                video_id = upload["snippet"]["resourceId"]["videoId"]
+                video_details = videos_details.get(video_id)
 
-                    if video_details:
-                        duration = video_details["contentDetails"]["duration"]
-                        is_short_video = is_short(duration)
+                if video_details:
+                    duration = video_details["contentDetails"]["duration"]
+                    is_short_video = is_short(duration)
 
-                        # Enregistrer le dernier short trouvé
-                        if is_short_video and last_short_id is None:
-                            last_short_id = video_id
+                    # Enregistrer le dernier short trouvé
+                    if is_short_video and last_short_id is None:
+                        last_short_id = video_id
 
-                        # Enregistrer la dernière vidéo normale trouvée
-                        if not is_short_video and last_video_id is None:
-                            last_video_id = video_id
+                    # Enregistrer la dernière vidéo normale trouvée
+                    if not is_short_video and last_video_id is None:
+                        last_video_id = video_id
 
-                        # Si on a trouvé les deux, on peut arrêter
-                        if last_video_id and last_short_id:
-                            break
+                    # Si on a trouvé les deux, on peut arrêter
+                    if last_video_id and last_short_id:
+                        break
 
         except Exception as e:
             error_message = str(e)
@@ -184,14 +314,8 @@ class YouTube(commands.Cog):
         # Ajouter la chaîne à la base de données
         # Note: notifyLive et lastLiveId sont conservés dans la DB pour la compatibilité
         # mais sont désactivés (0 et None) car la fonctionnalité live est supprimée
-        conn = database.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """INSERT INTO youtube_channels
-               (channelId, channelName, discordChannelId, roleId,
-                notifyVideos, notifyShorts, notifyLive,
-                lastVideoId, lastShortId, lastLiveId)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        row_id = await asyncio.to_thread(
+            self._insert_channel,
             (
                 actual_channel_id,
                 channel_name,
@@ -205,8 +329,23 @@ class YouTube(commands.Cog):
                 None,  # lastLiveId non utilisé (fonctionnalité supprimée)
             ),
         )
-        conn.commit()
-        conn.close()
+        if row_id is None:
+            await interaction.response.send_message(
+                f"La chaîne YouTube {channel_name} est déjà dans la liste."
+            )
+            return
+        self._channels[row_id] = {
+            "id": row_id,
+            "channelId": actual_channel_id,
+            "channelName": channel_name,
+            "discordChannelId": str(channel.id),
+            "roleId": str(ping_role.id) if ping_role else None,
+            "lastVideoId": last_video_id,
+            "lastShortId": last_short_id,
+            "notifyVideos": 1 if notify_videos else 0,
+            "notifyShorts": 1 if notify_shorts else 0,
+        }
+        _role_id_cache.pop(actual_channel_id, None)
 
         # Envoyer un message de confirmation
         notifications = []
@@ -265,31 +404,27 @@ class YouTube(commands.Cog):
     async def youtube_remove(self, interaction: discord.Interaction, channel_name: str):
         """Retirer une chaîne YouTube de la liste de surveillance."""
         if not channel_name:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT channelName FROM youtube_channels")
-            channels = cursor.fetchall()
-            conn.close()
+            channels = await asyncio.to_thread(self._list_channel_names)
             if not channels:
                 await interaction.response.send_message(
                     "Aucune chaîne YouTube n'est actuellement enregistrée."
                 )
                 return
-            channel_list = "\n".join([c[0] for c in channels])
+            channel_list = "\n".join(channels)
             await interaction.response.send_message(
                 f"Veuillez spécifier le nom de la chaîne à retirer. Chaînes disponibles :\n{channel_list}"
             )
             return
 
         # Retirer la chaîne de la base de données
-        conn = database.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM youtube_channels WHERE channelName = ?", (channel_name,)
-        )
-        conn.commit()
-        rows_affected = cursor.rowcount
-        conn.close()
+        rows_affected = await asyncio.to_thread(self._delete_channel, channel_name)
+        self._channels = {
+            row_id: row
+            for row_id, row in self._channels.items()
+            if row["channelName"] != channel_name
+        }
+        # La suppression se fait par nom : vider tout le cache des rôles
+        _role_id_cache.clear()
 
         if rows_affected > 0:
             await interaction.response.send_message(
@@ -319,12 +454,17 @@ class CheckYouTubeChannel:
             handle = handle[1:]
 
         # Méthode 1: Essayer avec le paramètre forHandle (pour les nouveaux handles)
-        url = "https://www.googleapis.com/youtube/v3/channels"
-        params = {"part": "id,snippet", "forHandle": handle, "key": self.api_key}
+        url = _YT_CHANNELS_URL
+        params = {
+            "part": "id,snippet",
+            "forHandle": handle,
+            "fields": _CHANNEL_FIELDS,
+            "key": self.api_key,
+        }
 
         async with self.session.get(url, params=params) as response:
             if response.status == 200:
-                data = await response.json()
+                data = await response.json(loads=orjson.loads)
                 if "items" in data and len(data["items"]) > 0:
                     return {
                         "id": data["items"][0]["id"],
@@ -336,7 +476,7 @@ class CheckYouTubeChannel:
             else:
                 # Autre erreur
                 error_data = (
-                    await response.json()
+                    await response.json(loads=orjson.loads)
                     if response.content_type == "application/json"
                     else {}
                 )
@@ -346,11 +486,16 @@ class CheckYouTubeChannel:
                 raise Exception(f"Erreur API YouTube: {error_msg}")
 
         # Méthode 2: Essayer avec le paramètre forUsername (pour les anciens usernames)
-        params = {"part": "id,snippet", "forUsername": handle, "key": self.api_key}
+        params = {
+            "part": "id,snippet",
+            "forUsername": handle,
+            "fields": _CHANNEL_FIELDS,
+            "key": self.api_key,
+        }
 
         async with self.session.get(url, params=params) as response:
             if response.status == 200:
-                data = await response.json()
+                data = await response.json(loads=orjson.loads)
                 if "items" in data and len(data["items"]) > 0:
                     return {
                         "id": data["items"][0]["id"],
@@ -358,18 +503,19 @@ class CheckYouTubeChannel:
                     }
 
         # Méthode 3: Utiliser l'API de recherche comme dernier recours
-        search_url = "https://www.googleapis.com/youtube/v3/search"
+        search_url = _YT_SEARCH_URL
         search_params = {
             "part": "snippet",
             "q": original_handle,
             "type": "channel",
             "maxResults": 1,
+            "fields": _SEARCH_CHANNEL_FIELDS,
             "key": self.api_key,
         }
 
         async with self.session.get(search_url, params=search_params) as response:
             if response.status == 200:
-                data = await response.json()
+                data = await response.json(loads=orjson.loads)
                 if "items" in data and len(data["items"]) > 0:
                     channel_id = data["items"][0]["snippet"]["channelId"]
                     # Récupérer les informations complètes du channel
@@ -382,15 +528,20 @@ class CheckYouTubeChannel:
         if not self.api_key:
             raise ValueError("La clé API YouTube n'est pas configurée.")
 
-        url = "https://www.googleapis.com/youtube/v3/channels"
-        params = {"part": "id,snippet", "id": channel_id, "key": self.api_key}
+        url = _YT_CHANNELS_URL
+        params = {
+            "part": "id,snippet",
+            "id": channel_id,
+            "fields": _CHANNEL_FIELDS,
+            "key": self.api_key,
+        }
 
         async with self.session.get(url, params=params) as response:
             if response.status != 200:
                 raise Exception(
                     f"Erreur lors de la vérification de la chaîne: {response.status}"
                 )
-            data = await response.json()
+            data = await response.json(loads=orjson.loads)
             if "items" in data and len(data["items"]) > 0:
                 return {
                     "id": data["items"][0]["id"],
@@ -403,42 +554,122 @@ class CheckYouTubeChannel:
         if not self.api_key:
             raise ValueError("La clé API YouTube n'est pas configurée.")
 
-        url = "https://www.googleapis.com/youtube/v3/channels"
-        params = {"part": "snippet", "id": channel_id, "key": self.api_key}
+        url = _YT_CHANNELS_URL
+        params = {
+            "part": "snippet",
+            "id": channel_id,
+            "fields": _CHANNEL_FIELDS,
+            "key": self.api_key,
+        }
 
         async with self.session.get(url, params=params) as response:
             if response.status != 200:
                 raise Exception(
                     f"Erreur lors de la récupération des informations de la chaîne: {response.status}"
                 )
-            data = await response.json()
+            data = await response.json(loads=orjson.loads)
             if "items" in data and len(data["items"]) > 0:
                 return data["items"][0]["snippet"]
             return None
 
-    async def get_latest_uploads(self, channel_id: str, max_results: int = 5):
-        """Récupérer les dernières vidéos d'une chaîne YouTube.
+    async def _get_items_by_ids(
+        self, url: URL, part: str, fields: str, ids: list[str]
+    ) -> dict:
+        """Récupérer des ressources par ID, par lots de 50 (une requête par lot).
 
-        Note: YouTube API returns playlist items in reverse chronological order
-        (newest first). This ordering is relied upon in check_youtube_loop() for
-        date-based filtering and early stopping optimizations.
+        Retourne un dictionnaire ID -> item.
         """
         if not self.api_key:
             raise ValueError("La clé API YouTube n'est pas configurée.")
 
-        # D'abord, obtenir l'ID de la playlist d'uploads
-        url = "https://www.googleapis.com/youtube/v3/channels"
-        params = {"part": "contentDetails", "id": channel_id, "key": self.api_key}
+        items = {}
+        for start in range(0, len(ids), YOUTUBE_MAX_IDS_PER_REQUEST):
+            batch = ids[start : start + YOUTUBE_MAX_IDS_PER_REQUEST]
+            params = {
+                "part": part,
+                "id": ",".join(batch),
+                "fields": fields,
+                "key": self.api_key,
+            }
+
+            async with self.session.get(url, params=params) as response:
+                if response.status != 200:
+                    try:
+                        error_data = (
+                            await response.json(loads=orjson.loads)
+                            if response.content_type == "application/json"
+                            else {}
+                        )
+                    except (aiohttp.ContentTypeError, ValueError):
+                        error_data = {}
+                    error_msg = error_data.get("error", {}).get(
+                        "message", f"Status {response.status}"
+                    )
+                    raise Exception(f"Erreur API YouTube: {error_msg}")
+                data = await response.json(loads=orjson.loads)
+
+            for item in data.get("items", []):
+                items[item["id"]] = item
+        return items
+
+    async def get_uploads_playlist_ids(self, channel_ids: list[str]) -> dict[str, str]:
+        """Récupérer en lot l'ID de la playlist d'uploads de plusieurs chaînes.
+
+        Les IDs standards (UC...) sont résolus sans requête ; seuls les autres
+        sont demandés à l'API.
+        """
+        playlists = {}
+        unknown = []
+        for channel_id in channel_ids:
+            playlist_id = derive_uploads_playlist_id(channel_id)
+            if playlist_id is None:
+                unknown.append(channel_id)
+            else:
+                playlists[channel_id] = playlist_id
+
+        if unknown:
+            items = await self._get_items_by_ids(
+                _YT_CHANNELS_URL,
+                "contentDetails",
+                _UPLOADS_PLAYLIST_FIELDS,
+                unknown,
+            )
+            for channel_id, item in items.items():
+                playlists[channel_id] = item["contentDetails"]["relatedPlaylists"][
+                    "uploads"
+                ]
+        return playlists
+
+    async def get_videos_details(self, video_ids: list[str]) -> dict[str, dict]:
+        """Récupérer en lot les détails de plusieurs vidéos (ID -> détails)."""
+        if not video_ids:
+            return {}
+        return await self._get_items_by_ids(
+            _YT_VIDEOS_URL,
+            "snippet,contentDetails",
+            _VIDEO_FIELDS,
+            video_ids,
+        )
+
+    async def _get_uploads_playlist_id(self, channel_id: str) -> Optional[str]:
+        """Récupérer l'ID de la playlist d'uploads d'une chaîne."""
+        url = _YT_CHANNELS_URL
+        params = {
+            "part": "contentDetails",
+            "id": channel_id,
+            "fields": _UPLOADS_PLAYLIST_FIELDS,
+            "key": self.api_key,
+        }
 
         async with self.session.get(url, params=params) as response:
             if response.status == 404:
                 # Le canal n'existe pas ou n'est pas accessible
                 logger.warning(f"Canal YouTube introuvable (404): {channel_id}")
-                return []
+                return None
             if response.status != 200:
                 try:
                     error_data = (
-                        await response.json()
+                        await response.json(loads=orjson.loads)
                         if response.content_type == "application/json"
                         else {}
                     )
@@ -451,25 +682,49 @@ class CheckYouTubeChannel:
                     f"Erreur lors de la récupération de l'ID de playlist: {error_msg}"
                 )
             try:
-                data = await response.json()
+                data = await response.json(loads=orjson.loads)
             except Exception as e:
                 logger.error(
                     f"Erreur lors du parsing JSON pour le canal {channel_id}: {e}"
                 )
-                return []
+                return None
             if "items" not in data or len(data["items"]) == 0:
                 logger.info(f"Aucune donnée de canal trouvée pour: {channel_id}")
+                return None
+            return data["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+    async def get_latest_uploads(
+        self,
+        channel_id: str,
+        max_results: int = 5,
+        uploads_playlist_id: Optional[str] = None,
+    ):
+        """Récupérer les dernières vidéos d'une chaîne YouTube.
+
+        ``uploads_playlist_id`` évite la requête de recherche de la playlist
+        d'uploads quand il est déjà connu (voir get_uploads_playlist_ids).
+
+        Note: YouTube API returns playlist items in reverse chronological order
+        (newest first). This ordering is relied upon in check_youtube_loop() for
+        date-based filtering and early stopping optimizations.
+        """
+        if not self.api_key:
+            raise ValueError("La clé API YouTube n'est pas configurée.")
+
+        if uploads_playlist_id is None:
+            uploads_playlist_id = derive_uploads_playlist_id(channel_id)
+        if uploads_playlist_id is None:
+            uploads_playlist_id = await self._get_uploads_playlist_id(channel_id)
+            if uploads_playlist_id is None:
                 return []
-            uploads_playlist_id = data["items"][0]["contentDetails"][
-                "relatedPlaylists"
-            ]["uploads"]
 
-        # Ensuite, récupérer les vidéos de la playlist
-        url = "https://www.googleapis.com/youtube/v3/playlistItems"
+        # Récupérer les vidéos de la playlist
+        url = _YT_PLAYLIST_ITEMS_URL
         params = {
             "part": "snippet",
             "playlistId": uploads_playlist_id,
             "maxResults": max_results,
+            "fields": _PLAYLIST_ITEMS_FIELDS,
             "key": self.api_key,
         }
 
@@ -483,7 +738,7 @@ class CheckYouTubeChannel:
             if response.status != 200:
                 try:
                     error_data = (
-                        await response.json()
+                        await response.json(loads=orjson.loads)
                         if response.content_type == "application/json"
                         else {}
                     )
@@ -496,7 +751,7 @@ class CheckYouTubeChannel:
                     f"Erreur lors de la récupération des vidéos: {error_msg}"
                 )
             try:
-                data = await response.json()
+                data = await response.json(loads=orjson.loads)
             except Exception as e:
                 logger.error(
                     f"Erreur lors du parsing JSON de la playlist {uploads_playlist_id}: {e}"
@@ -504,55 +759,44 @@ class CheckYouTubeChannel:
                 return []
             return data.get("items", [])
 
-    async def get_video_details(self, video_id: str):
-        """Récupérer les détails d'une vidéo YouTube."""
-        if not self.api_key:
-            raise ValueError("La clé API YouTube n'est pas configurée.")
-
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet,contentDetails,liveStreamingDetails",
-            "id": video_id,
-            "key": self.api_key,
-        }
-
-        async with self.session.get(url, params=params) as response:
-            if response.status == 404:
-                logger.warning(f"Vidéo YouTube introuvable (404): {video_id}")
-                return None
-            if response.status != 200:
-                try:
-                    error_data = (
-                        await response.json()
-                        if response.content_type == "application/json"
-                        else {}
-                    )
-                except (aiohttp.ContentTypeError, ValueError):
-                    error_data = {}
-                error_msg = error_data.get("error", {}).get(
-                    "message", f"Status {response.status}"
-                )
-                raise Exception(
-                    f"Erreur lors de la récupération des détails de la vidéo: {error_msg}"
-                )
-            try:
-                data = await response.json()
-            except Exception as e:
-                logger.error(
-                    f"Erreur lors du parsing JSON pour la vidéo {video_id}: {e}"
+    async def get_latest_uploads_many(
+        self,
+        channel_ids: list[str],
+        max_results: int = 5,
+        uploads_playlists: Optional[dict[str, str]] = None,
+    ) -> dict:
+        """Récupérer en parallèle les dernières vidéos de plusieurs chaînes.
+
+        Retourne un dictionnaire ID de chaîne -> liste d'uploads, ou l'exception
+        levée pour cette chaîne (une erreur n'interrompt pas les autres).
+        """
+        uploads_playlists = uploads_playlists or {}
+        semaphore = asyncio.Semaphore(YOUTUBE_MAX_CONCURRENT_REQUESTS)
+
+        async def fetch(channel_id: str):
+            async with semaphore:
+                return await self.get_latest_uploads(
+                    channel_id,
+                    max_results=max_results,
+                    uploads_playlist_id=uploads_playlists.get(channel_id),
                 )
-                return None
-            if "items" in data and len(data["items"]) > 0:
-                return data["items"][0]
-            return None
+
+        results = await asyncio.gather(
+            *(fetch(channel_id) for channel_id in channel_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(channel_ids, results))
 
 
 def is_short(video_duration: str) -> bool:
     """Déterminer si une vidéo est un short basé sur sa durée (moins de 61 secondes)."""
-    # Format de durée ISO 8601: PT#H#M#S ou PT#M#S ou PT#S
-    import re
+    # Cas le plus courant pour un short : PT#S (secondes uniquement)
+    if video_duration.startswith("PT") and video_duration.endswith("S"):
+        seconds = video_duration[2:-1]
+        if seconds.isdigit():
+            return int(seconds) <= 60
 
-    match = re.match(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", video_duration)
+    match = _ISO_DURATION.match(video_duration)
     if match:
         hours = int(match.group(1) or 0)
         minutes = int(match.group(2) or 0)
@@ -562,27 +806,105 @@ def is_short(video_duration: str) -> bool:
     return False
 
 
+def _fetch_role_id(channel_id: str) -> Optional[int]:
+    """Lire l'ID du rôle à mentionner pour une chaîne (exécuté dans un thread)."""
+    conn = database.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT roleId FROM youtube_channels WHERE channelId = ?", (channel_id,)
+        )
+        result = cursor.fetchone()
+    finally:
+        conn.close()
+    return int(result[0]) if result and result[0] else None
+
+
+def _enqueue_announcement(
+    discord_channel: discord.TextChannel,
+    content: Optional[str],
+    embed: discord.Embed,
+) -> None:
+    """Mettre une annonce dans la file d'envoi de son salon."""
+    queue = _send_queues.get(discord_channel.id)
+    if queue is not None:
+        queue.append((content, embed))
+        return
+
+    queue = _send_queues[discord_channel.id] = deque([(content, embed)])
+    task = asyncio.create_task(_drain_send_queue(discord_channel, queue))
+    _send_tasks.add(task)
+    task.add_done_callback(_send_tasks.discard)
+
+
+async def _drain_send_queue(discord_channel: discord.TextChannel, queue: deque):
+    """Envoyer les annonces en attente d'un salon, dans l'ordre.
+
+    Les annonces consécutives avec la même mention sont regroupées dans un seul
+    message (jusqu'à 10 embeds).
+    """
+    try:
+        while queue:
+            content, embed = queue.popleft()
+            embeds = [embed]
+            while (
+                queue
+                and queue[0][0] == content
+                and len(embeds) < DISCORD_MAX_EMBEDS_PER_MESSAGE
+            ):
+                embeds.append(queue.popleft()[1])
+            try:
+                await discord_channel.send(content=content, embeds=embeds)
+            except discord.errors.Forbidden as e:
+                # Les annonces suivantes de ce salon échoueraient de la même façon
+                logger.error(
+                    f"Permission Discord refusée pour {discord_channel.name} "
+                    f"(ID: {discord_channel.id}) lors de l'annonce d'une "
+                    f"vidéo/short, {len(queue)} annonce(s) abandonnée(s): {e}"
+                )
+                queue.clear()
+            except Exception as e:
+                logger.error(
+                    f"Erreur lors de l'envoi d'une annonce YouTube dans "
+                    f"{discord_channel.name} (ID: {discord_channel.id}): {e}"
+                )
+    finally:
+        _send_queues.pop(discord_channel.id, None)
+
+
 class AnnounceYouTube:
     """Classe pour annoncer les nouveaux contenus YouTube."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # Embeds déjà construits : (type, ID de vidéo) -> embed, réutilisés quand
+        # une même chaîne est suivie dans plusieurs salons
+        self._embeds: dict[tuple[str, str], discord.Embed] = {}
 
     async def get_role(self, channel_id: str):
         """Récupérer le rôle à mentionner pour les annonces."""
-        conn = database.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT roleId FROM youtube_channels WHERE channelId = ?", (channel_id,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        if result and result[0]:
-            return discord.utils.get(self.bot.guilds[0].roles, id=int(result[0]))
-        return None
+        if channel_id not in _role_id_cache:
+            youtube_cog = self.bot.get_cog("YouTube")
+            if youtube_cog is not None:
+                # Rôle du premier abonnement, comme _fetch_role_id
+                subs = youtube_cog.get_subs(channel_id)
+                role_id = subs[0]["roleId"] if subs else None
+                _role_id_cache[channel_id] = int(role_id) if role_id else None
+            else:
+                _role_id_cache[channel_id] = await asyncio.to_thread(
+                    _fetch_role_id, channel_id
+                )
 
-    async def announce_video(
+        role_id = _role_id_cache[channel_id]
+        if role_id is None:
+            return None
+        # Serveur configuré (recherche O(1)), à défaut le premier serveur du bot
+        guild = self.bot.get_guild(SERVER_ID) or self.bot.guilds[0]
+        return guild.get_role(role_id)
+
+    async def announce(
         self,
+        kind: str,
         channel_id: str,
         channel_name: str,
         discord_channel: discord.TextChannel,
@@ -591,49 +913,38 @@ class AnnounceYouTube:
         thumbnail_url: str,
         discord_role: Optional[discord.Role] = None,
     ):
-        """Annoncer une nouvelle vidéo dans un salon Discord."""
+        """Annoncer un nouveau contenu (``kind`` : "video" ou "short")."""
         if discord_role is None:
             discord_role = await self.get_role(channel_id)
 
-        embed = discord.Embed(
-            title=f"📹 Nouvelle vidéo : {video_title}",
-            description=f"**Chaîne** : {channel_name}\n**Regardez la vidéo ici :** https://www.youtube.com/watch?v={video_id}",
-            color=discord.Color.red(),
+        embed = self._embeds.get((kind, video_id))
+        if embed is None:
+            title, link_label, url_template, color = _ANNOUNCE_KINDS[kind]
+            video_url = url_template.format(video_id)
+            embed = discord.Embed(
+                title=f"{title} : {video_title}",
+                description=(
+                    f"**Chaîne** : {channel_name}\n**{link_label} :** {video_url}"
+                ),
+                color=color,
+            )
+            if thumbnail_url:
+                embed.set_image(url=thumbnail_url)
+            self._embeds[(kind, video_id)] = embed
+
+        _enqueue_announcement(
+            discord_channel,
+            discord_role.mention if discord_role is not None else None,
+            embed,
         )
-        if thumbnail_url:
-            embed.set_image(url=thumbnail_url)
 
-        if discord_role is not None:
-            await discord_channel.send(content=discord_role.mention, embed=embed)
-        else:
-            await discord_channel.send(embed=embed)
+    async def announce_video(self, *args, **kwargs):
+        """Annoncer une nouvelle vidéo dans un salon Discord."""
+        await self.announce("video", *args, **kwargs)
 
-    async def announce_short(
-        self,
-        channel_id: str,
-        channel_name: str,
-        discord_channel: discord.TextChannel,
-        video_id: str,
-        video_title: str,
-        thumbnail_url: str,
-        discord_role: Optional[discord.Role] = None,
-    ):
+    async def announce_short(self, *args, **kwargs):
         """Annoncer un nouveau short dans un salon Discord."""
-        if discord_role is None:
-            discord_role = await self.get_role(channel_id)
-
-        embed = discord.Embed(
-            title=f"🎬 Nouveau short : {video_title}",
-            description=f"**Chaîne** : {channel_name}\n**Regardez le short ici :** https://www.youtube.com/shorts/{video_id}",
-            color=discord.Color.orange(),
-        )
-        if thumbnail_url:
-            embed.set_image(url=thumbnail_url)
-
-        if discord_role is not None:
-            await discord_channel.send(content=discord_role.mention, embed=embed)
-        else:
-            await discord_channel.send(embed=embed)
+        await self.announce("short", *args, **kwargs)
 
 
 async def setup(bot: commands.Bot):
@@ -1,291 +1,460 @@
+import atexit
+import functools
 import os
+import re
 import sqlite3
-
-import dotenv
+import threading
+import weakref
 
 from utils.logging_config import get_logger
 
-# Charger les variables d'environnement depuis le fichier .env
-dotenv.load_dotenv()
+__all__ = [
+    "DB_PATH",
+    "SCHEMA_VERSION",
+    "bulk_execute",
+    "create_database",
+    "get_db_connection",
+    "get_persistent_connection",
+]
 
 # Configure logging for this module
 logger = get_logger(__name__)
 
-# Chemin vers la base de données SQLite
-# Convertir en chemin absolu pour éviter les problèmes de localisation
-_db_path = os.getenv("db_path")
-if _db_path:
+
+@functools.lru_cache(maxsize=1)
+def _resolve_db_path():
+    """Chemin vers la base de données SQLite, résolu une seule fois.
+
+    Le chemin est converti en absolu pour éviter les problèmes de localisation.
+    Le fichier .env n'est lu qu'ici, au premier accès à la base.
+    """
+    import dotenv
+
+    # Charger les variables d'environnement depuis le fichier .env
+    dotenv.load_dotenv()
+
+    db_path = os.getenv("db_path")
+    if not db_path:
+        return None
     # Si le chemin est relatif, le rendre absolu par rapport au répertoire du script
-    if not os.path.isabs(_db_path):
+    if not os.path.isabs(db_path):
         script_dir = os.path.dirname(__file__)
-        DB_PATH = os.path.abspath(os.path.join(script_dir, _db_path))
-    else:
-        DB_PATH = _db_path
-else:
-    DB_PATH = None
+        return os.path.abspath(os.path.join(script_dir, db_path))
+    return db_path
 
 
-def get_db_connection():
-    """Crée une connexion à la base de données SQLite."""
-    if not DB_PATH:
+def _require_db_path() -> str:
+    """Renvoie le chemin de la base, ou lève ValueError s'il n'est pas défini."""
+    db_path = _resolve_db_path()
+    if not db_path:
         raise ValueError(
             "Le chemin de la base de données n'est pas défini "
             "dans les variables d'environnement."
         )
-    
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH, timeout=10.0)
-        conn.row_factory = sqlite3.Row  # Permet d'accéder aux colonnes par nom
-        return conn
-    except sqlite3.Error as e:
-        # Fermer la connexion si elle a été créée mais que la configuration a échoué
-        if conn:
-            conn.close()
-        raise RuntimeError(f"Impossible de se connecter à la base de données {DB_PATH}: {e}")
+    return db_path
 
 
-def create_database():
-    """Crée la base de données et les tables nécessaires."""
-    if not DB_PATH:
-        raise ValueError(
-            "Le chemin de la base de données n'est pas défini "
-            "dans les variables d'environnement."
-        )
+def __getattr__(name):
+    # database.DB_PATH reste disponible, mais n'est résolu qu'au premier accès
+    if name == "DB_PATH":
+        return _resolve_db_path()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    db_existed = os.path.exists(DB_PATH)
-    if db_existed:
-        logger.debug(f"La base de données existe déjà à l'emplacement: {DB_PATH}")
-    else:
-        logger.info(f"Création de la base de données à l'emplacement: {DB_PATH}")
 
-    # Créer les tables nécessaires (toujours exécuter cette partie)
-    # CREATE TABLE IF NOT EXISTS permet de créer uniquement si la table n'existe pas
-    # et ne supprime PAS les données existantes
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Création de la table des utilisateurs
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            guildId TEXT NOT NULL,
-            userId TEXT NOT NULL,
-            xp REAL DEFAULT 0,
-            level INTEGER DEFAULT 1,
-            messages INTEGER DEFAULT 0,
-            coins REAL DEFAULT 0,
-            corners INTEGER DEFAULT 0,
-            PRIMARY KEY (guildId, userId)
-        )
-    """
-    )
+# Taille du cache de requêtes préparées par connexion (128 par défaut) : assez
+# grande pour toutes les requêtes distinctes du bot, qui ne sont alors
+# compilées qu'une fois par connexion
+STATEMENT_CACHE_SIZE = 256
 
-    # Création de la table des streamers
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS streamers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            streamerName TEXT NOT NULL,
-            streamChannelId TEXT,
-            roleId TEXT,
-            announced INTEGER DEFAULT 0,
-            startTime TEXT
-        )
-    """
-    )
+# Le mode WAL est conservé dans le fichier : il n'est activé qu'une fois par
+# processus, à la première connexion
+_wal_enabled = False
 
-    # Création de la table des chaînes YouTube
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS youtube_channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channelId TEXT NOT NULL,
-            channelName TEXT NOT NULL,
-            discordChannelId TEXT NOT NULL,
-            roleId TEXT,
-            lastVideoId TEXT,
-            lastShortId TEXT,
-            lastLiveId TEXT,
-            notifyVideos INTEGER DEFAULT 1,
-            notifyShorts INTEGER DEFAULT 1,
-            notifyLive INTEGER DEFAULT 1
-        )
-    """
-    )
 
-    # Création de la table pour le jeu du compteur
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS counter_game (
-            guildId TEXT NOT NULL,
-            channelId TEXT NOT NULL,
-            messageId TEXT DEFAULT '',
-            userId TEXT NOT NULL,
-            lastUserId TEXT DEFAULT '0',
-            count INTEGER DEFAULT 0,
-            PRIMARY KEY (guildId, channelId)
-        )
-    """
-    )
+def _configure_connection(conn: sqlite3.Connection, row_factory=sqlite3.Row):
+    """Applique les réglages propres à chaque connexion.
 
-    # --- MODERATION SYSTEM TABLES ---
-
-    # Table des avertissements (warnings)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS warnings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            warn_count INTEGER DEFAULT 0,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL,
-            UNIQUE(guild_id, user_id)
-        )
+    En WAL avec synchronous=NORMAL, un commit n'attend plus de fsync du journal
+    et les lectures ne sont pas bloquées par les écritures.
     """
-    )
+    global _wal_enabled
+    # sqlite3.Row permet d'accéder aux colonnes par nom ; None renvoie de simples
+    # tuples, plus rapides à construire pour les lectures fréquentes
+    conn.row_factory = row_factory
+    if not _wal_enabled:
+        # Pages de 8 Kio : arbres B moins profonds pour les parcours par serveur.
+        # Sans effet sur une base existante (il faudrait un VACUUM hors WAL),
+        # donc appliqué avant la première écriture d'une nouvelle base
+        conn.execute("PRAGMA page_size=8192")
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled = True
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 Mio lus via mmap
+    conn.execute("PRAGMA cache_size=-20000")  # 20 Mio de cache de pages
 
-    # Index pour les recherches fréquentes
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_warnings_guild_user 
-        ON warnings(guild_id, user_id)
-    """
-    )
 
-    # Historique des avertissements (audit trail immuable)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS warning_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            action TEXT NOT NULL,
-            warn_count_before INTEGER NOT NULL,
-            warn_count_after INTEGER NOT NULL,
-            moderator_id TEXT,
-            reason TEXT,
-            created_at TEXT NOT NULL
-        )
-    """
-    )
+class _PooledConnection(sqlite3.Connection):
+    """Connexion réutilisée par son thread : close() la rend au pool.
 
-    # Index pour les recherches d'historique
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_history_guild_user 
-        ON warning_history(guild_id, user_id)
+    Une transaction laissée ouverte est annulée, comme le ferait une vraie
+    fermeture, et la connexion garde son cache de requêtes préparées.
+    Le pool ne garde que les connexions libres : une connexion empruntée puis
+    abandonnée sans close() (exception) est fermée par le ramasse-miettes, ce
+    qui libère son éventuel verrou d'écriture.
     """
-    )
 
-    # Table des appels (appeals)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS moderation_appeals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            warning_history_id INTEGER,
-            appeal_reason TEXT NOT NULL,
-            moderator_id TEXT,
-            status TEXT DEFAULT 'pending',
-            moderator_decision TEXT,
-            created_at TEXT NOT NULL,
-            reviewed_at TEXT,
-            FOREIGN KEY(warning_history_id) REFERENCES warning_history(id)
-        )
-    """
-    )
+    # Emplacement du thread propriétaire, renseigné à l'ouverture : close()
+    # peut être appelé depuis un autre thread (asyncio.to_thread)
+    _slot = None
 
-    # Index pour les appels en attente
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_appeals_status 
-        ON moderation_appeals(guild_id, status)
-    """
-    )
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        slot = self._slot
+        if slot is None or slot.conn is not None:
+            # Une connexion libre existe déjà pour ce thread (appel imbriqué)
+            self._really_close()
+            return
+        slot.conn = self
 
-    # Configuration de modération par serveur
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS moderation_config (
-            guild_id TEXT PRIMARY KEY,
-            log_channel_id TEXT,
-            appeal_channel_id TEXT,
-            ai_enabled INTEGER DEFAULT 1,
-            ai_confidence_threshold INTEGER DEFAULT 60,
-            ai_flag_channel_id TEXT,
-            ai_model TEXT DEFAULT 'llama2',
-            ollama_host TEXT DEFAULT 'http://localhost:11434',
-            decay_multiplier REAL DEFAULT 1.0,
-            warn_1_decay_days INTEGER DEFAULT 7,
-            warn_2_decay_days INTEGER DEFAULT 14,
-            warn_3_decay_days INTEGER DEFAULT 21,
-            mute_duration_warn_2 INTEGER DEFAULT 3600,
-            mute_duration_warn_3 INTEGER DEFAULT 86400,
-            rules_message_id TEXT,
-            created_at TEXT NOT NULL
-        )
-    """
-    )
+    def _really_close(self):
+        super().close()
+
+
+class _PoolSlot:
+    """Connexion libre d'un thread (None quand elle est empruntée)."""
+
+    __slots__ = ("conn",)
+
+    def __init__(self):
+        self.conn = None
 
-    # Table des messages signalés par l'IA
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ai_flags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            message_id TEXT NOT NULL,
-            channel_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            message_content TEXT NOT NULL,
-            ai_score INTEGER NOT NULL,
-            ai_category TEXT NOT NULL,
-            ai_reason TEXT NOT NULL,
-            moderator_action TEXT DEFAULT 'pending',
-            moderator_id TEXT,
-            created_at TEXT NOT NULL,
-            reviewed_at TEXT,
-            UNIQUE(message_id)
-        )
-    """
-    )
 
-    # Index pour les flags en attente
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_ai_flags_status 
-        ON ai_flags(guild_id, moderator_action)
+# Une connexion par thread (boucle asyncio ou threads de asyncio.to_thread)
+_pool = threading.local()
+# Références faibles : une connexion perdue par son emprunteur reste collectable
+_pooled_connections = weakref.WeakSet()
+_pooled_lock = threading.Lock()
+
+
+@atexit.register
+def _close_pooled_connections():
+    with _pooled_lock:
+        for conn in list(_pooled_connections):
+            try:
+                conn._really_close()
+            except sqlite3.Error:
+                pass
+        _pooled_connections.clear()
+
+
+def get_db_connection(row_factory=sqlite3.Row):
+    """Crée une connexion à la base de données SQLite.
+
+    La connexion de ce thread est réutilisée si elle est libre ; un appel
+    imbriqué (connexion déjà empruntée) obtient une connexion indépendante.
     """
-    )
+    slot = getattr(_pool, "slot", None)
+    if slot is None:
+        slot = _pool.slot = _PoolSlot()
+
+    # Chemin rapide : le chemin a déjà été validé à l'ouverture de la connexion
+    pooled = slot.conn
+    if pooled is not None:
+        slot.conn = None
+        pooled.row_factory = row_factory
+        return pooled
 
-    # Table des mutes actifs
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS active_mutes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            moderator_id TEXT,
-            reason TEXT NOT NULL,
-            expires_at TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            UNIQUE(guild_id, user_id)
+    db_path = _require_db_path()
+    conn = None
+    try:
+        conn = sqlite3.connect(
+            db_path, timeout=10.0, check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE, factory=_PooledConnection,
         )
+        _configure_connection(conn, row_factory)
+        conn._slot = slot
+        with _pooled_lock:
+            _pooled_connections.add(conn)
+        return conn
+    except sqlite3.Error as e:
+        # Fermer la connexion si elle a été créée mais que la configuration a échoué
+        if conn is not None:
+            conn._really_close()
+        raise RuntimeError(
+            f"Impossible de se connecter à la base de données {db_path}: {e}"
+        )
+
+
+def bulk_execute(sql: str, rows) -> None:
+    """Exécute une même requête pour toutes les lignes, en une transaction.
+
+    executemany lie les paramètres en C, et le bloc ``with conn`` valide le
+    tout en un seul commit (ou annule tout en cas d'erreur).
     """
-    )
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany(sql, rows)
+    finally:
+        conn.close()
+
+
+def get_persistent_connection(row_factory=sqlite3.Row):
+    """Crée une connexion SQLite destinée à rester ouverte toute la vie d'un cog.
 
-    # Index pour les recherches d'expiration
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_mutes_expires 
-        ON active_mutes(expires_at)
+    La connexion est utilisable depuis plusieurs threads (l'appelant doit
+    sérialiser les accès) et garde ses requêtes préparées en cache.
     """
+    db_path = _require_db_path()
+
+    conn = sqlite3.connect(
+        db_path,
+        timeout=10.0,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
     )
+    _configure_connection(conn, row_factory)
+    return conn
+
+
+# Version du schéma, conservée dans PRAGMA user_version : à incrémenter à
+# chaque modification de _SCHEMA_DDL pour qu'il soit réappliqué au démarrage
+SCHEMA_VERSION = 5
+
+# Schéma complet de la base, exécuté en un seul appel par create_database.
+# Les tables à clé primaire courte, sans id auto-incrémenté, sont déclarées
+# WITHOUT ROWID : la clé primaire est directement l'arbre de stockage.
+# CREATE TABLE IF NOT EXISTS permet de créer uniquement si la table n'existe pas
+# et ne supprime PAS les données existantes
+_SCHEMA_DDL = """
+-- Création de la table des utilisateurs
+CREATE TABLE IF NOT EXISTS users (
+    guildId TEXT NOT NULL,
+    userId TEXT NOT NULL,
+    xp REAL DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    messages INTEGER DEFAULT 0,
+    coins REAL DEFAULT 0,
+    corners INTEGER DEFAULT 0,
+    PRIMARY KEY (guildId, userId)
+) WITHOUT ROWID;
+
+-- Index pour le classement (/leaderboard) : parcours ordonné par XP dans un
+-- serveur, arrêté dès le LIMIT atteint sans tri de toute la table
+CREATE INDEX IF NOT EXISTS idx_users_guild_xp
+ON users(guildId, xp DESC);
+
+-- Création de la table des streamers
+CREATE TABLE IF NOT EXISTS streamers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    streamerName TEXT NOT NULL,
+    streamChannelId TEXT,
+    roleId TEXT,
+    announced INTEGER DEFAULT 0,
+    startTime TEXT
+);
+
+-- Création de la table des chaînes YouTube
+CREATE TABLE IF NOT EXISTS youtube_channels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channelId TEXT NOT NULL,
+    channelName TEXT NOT NULL,
+    discordChannelId TEXT NOT NULL,
+    roleId TEXT,
+    lastVideoId TEXT,
+    lastShortId TEXT,
+    lastLiveId TEXT,
+    notifyVideos INTEGER DEFAULT 1,
+    notifyShorts INTEGER DEFAULT 1,
+    notifyLive INTEGER DEFAULT 1
+);
 
-    conn.commit()
-    conn.close()
+-- Vidéos YouTube déjà traitées par abonnement (youtube_channels.id), pour ne
+-- pas redemander leurs détails à l'API à chaque vérification
+CREATE TABLE IF NOT EXISTS seen_videos (
+    subscriptionId INTEGER NOT NULL,
+    videoId TEXT NOT NULL,
+    isShort INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    PRIMARY KEY (subscriptionId, videoId)
+) WITHOUT ROWID;
+
+-- Création de la table pour le jeu du compteur
+CREATE TABLE IF NOT EXISTS counter_game (
+    guildId TEXT NOT NULL,
+    channelId TEXT NOT NULL,
+    messageId TEXT DEFAULT '',
+    userId TEXT NOT NULL,
+    lastUserId TEXT DEFAULT '0',
+    count INTEGER DEFAULT 0,
+    PRIMARY KEY (guildId, channelId)
+) WITHOUT ROWID;
+
+-- --- MODERATION SYSTEM TABLES ---
+
+-- Table des avertissements (warnings)
+CREATE TABLE IF NOT EXISTS warnings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    warn_count INTEGER DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE(guild_id, user_id)
+);
+
+-- UNIQUE(guild_id, user_id) fournit déjà l'index des recherches fréquentes :
+-- l'ancien index explicite en doublon est supprimé
+DROP INDEX IF EXISTS idx_warnings_guild_user;
+
+-- Historique des avertissements (audit trail immuable)
+CREATE TABLE IF NOT EXISTS warning_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    warn_count_before INTEGER NOT NULL,
+    warn_count_after INTEGER NOT NULL,
+    moderator_id TEXT,
+    reason TEXT,
+    created_at TEXT NOT NULL
+);
+
+-- Index pour les recherches d'historique
+CREATE INDEX IF NOT EXISTS idx_history_guild_user
+ON warning_history(guild_id, user_id);
+
+-- Table des appels (appeals)
+CREATE TABLE IF NOT EXISTS moderation_appeals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    warning_history_id INTEGER,
+    appeal_reason TEXT NOT NULL,
+    moderator_id TEXT,
+    status TEXT DEFAULT 'pending',
+    moderator_decision TEXT,
+    created_at TEXT NOT NULL,
+    reviewed_at TEXT,
+    FOREIGN KEY(warning_history_id) REFERENCES warning_history(id)
+);
+
+-- Index partiel pour les appels en attente : seules les lignes 'pending'
+-- y figurent, les appels traités ne coûtent rien à maintenir
+DROP INDEX IF EXISTS idx_appeals_status;
+CREATE INDEX IF NOT EXISTS idx_appeals_pending
+ON moderation_appeals(guild_id, user_id) WHERE status = 'pending';
+
+-- Configuration de modération par serveur
+CREATE TABLE IF NOT EXISTS moderation_config (
+    guild_id TEXT PRIMARY KEY,
+    log_channel_id TEXT,
+    appeal_channel_id TEXT,
+    ai_enabled INTEGER DEFAULT 1,
+    ai_confidence_threshold INTEGER DEFAULT 60,
+    ai_flag_channel_id TEXT,
+    ai_model TEXT DEFAULT 'llama2',
+    ollama_host TEXT DEFAULT 'http://localhost:11434',
+    decay_multiplier REAL DEFAULT 1.0,
+    warn_1_decay_days INTEGER DEFAULT 7,
+    warn_2_decay_days INTEGER DEFAULT 14,
+    warn_3_decay_days INTEGER DEFAULT 21,
+    mute_duration_warn_2 INTEGER DEFAULT 3600,
+    mute_duration_warn_3 INTEGER DEFAULT 86400,
+    rules_message_id TEXT,
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Table des messages signalés par l'IA
+CREATE TABLE IF NOT EXISTS ai_flags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    message_content TEXT NOT NULL,
+    ai_score INTEGER NOT NULL,
+    ai_category TEXT NOT NULL,
+    ai_reason TEXT NOT NULL,
+    moderator_action TEXT DEFAULT 'pending',
+    moderator_id TEXT,
+    created_at TEXT NOT NULL,
+    reviewed_at TEXT,
+    UNIQUE(message_id)
+);
+
+-- Index partiel pour les flags en attente, dans l'ordre d'affichage
+DROP INDEX IF EXISTS idx_ai_flags_status;
+CREATE INDEX IF NOT EXISTS idx_ai_flags_pending
+ON ai_flags(guild_id, ai_score DESC, created_at) WHERE moderator_action = 'pending';
+
+-- Table des mutes actifs
+CREATE TABLE IF NOT EXISTS active_mutes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    moderator_id TEXT,
+    reason TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE(guild_id, user_id)
+);
+
+-- Les prochaines expirations sont suivies en mémoire (tas dans
+-- utils/moderation_utils.py) : plus d'index à maintenir à chaque mute
+DROP INDEX IF EXISTS idx_mutes_expires;
+
+-- Sessions vocales en cours, pour conserver l'heure entamée après un redémarrage
+CREATE TABLE IF NOT EXISTS voice_sessions (
+    guildId INTEGER NOT NULL,
+    userId INTEGER NOT NULL,
+    last_ts REAL NOT NULL,
+    PRIMARY KEY (guildId, userId)
+) WITHOUT ROWID;
+"""
+
+# Tables et index que le schéma doit contenir
+_SCHEMA_OBJECTS = frozenset(
+    re.findall(r"CREATE (?:TABLE|INDEX) IF NOT EXISTS (\w+)", _SCHEMA_DDL)
+)
+
+
+def create_database():
+    """Crée la base de données et les tables nécessaires."""
+    db_path = _require_db_path()
+
+    db_existed = os.path.exists(db_path)
+    if db_existed:
+        logger.debug("La base de données existe déjà à l'emplacement: %s", db_path)
+    else:
+        logger.info("Création de la base de données à l'emplacement: %s", db_path)
+
+    conn = get_db_connection()
+    try:
+        # Schéma déjà à jour et complet (une seule lecture de sqlite_master) :
+        # inutile de réexécuter toutes les instructions DDL
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            present = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'index')"
+                )
+            }
+            if _SCHEMA_OBJECTS <= present:
+                logger.debug("Schéma de la base de données déjà à jour")
+                return
+
+        # Toutes les tables et tous les index en une seule transaction, avec
+        # la version du schéma
+        conn.executescript(
+            "BEGIN;\n"
+            + _SCHEMA_DDL
+            + f"\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;"
+        )
+    finally:
+        conn.close()
 
     if db_existed:
         logger.debug(
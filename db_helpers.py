@@ -17,6 +17,9 @@ from database import get_db_connection
 # XP-to-level configuration
 LEVEL_MULTIPLIER = 125
 
+# Callbacks called with (guild_id, user_id) after a user's XP is changed
+_xp_listeners: list = []
+
 
 def calculate_level_from_xp(xp: float) -> int:
     """Calculate level from XP."""
@@ -30,6 +33,26 @@ def calculate_xp_for_level(level: int) -> float:
     return ((level - 1) ** 2) * LEVEL_MULTIPLIER
 
 
+def register_xp_listener(callback) -> None:
+    """Register a callback notified when a user's XP changes in the database."""
+    _xp_listeners.append(callback)
+
+
+def unregister_xp_listener(callback) -> None:
+    """Remove a callback registered with register_xp_listener."""
+    if callback in _xp_listeners:
+        _xp_listeners.remove(callback)
+
+
+def notify_xp_changed(guild_id, user_id) -> None:
+    """
+    Notify listeners that a user's XP row was written.
+    May be called from any thread.
+    """
+    for callback in list(_xp_listeners):
+        callback(guild_id, user_id)
+
+
 @contextmanager
 def transaction(conn: sqlite3.Connection):
     """Context manager for database transactions."""
@@ -259,6 +282,7 @@ def add_xp(
         )
 
         conn.commit()
+        notify_xp_changed(guild_id, user_id)
 
         return {
             "old_xp": user["xp"],
@@ -322,6 +346,7 @@ def spend_xp(
         )
 
         conn.commit()
+        notify_xp_changed(guild_id, user_id)
 
         return {
             "old_xp": user["xp"],
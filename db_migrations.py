@@ -6,55 +6,51 @@ This module provides migration scripts to:
 2. Create new tables for quests, shop, trades, and transactions
 3. Add guild_settings table for per-guild configuration
 4. Ensure all expected columns exist on existing tables
+5. Enforce one row per (YouTube channel, Discord channel) pair
+6. Rebuild short-key tables as WITHOUT ROWID tables
 """
 
 import logging
 import re
 import os
-import shutil
 import sqlite3
 from datetime import datetime
 
-import dotenv
+import database
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-dotenv.load_dotenv()
-
-# Database path
-_db_path = os.getenv("db_path")
-if _db_path:
-    if not os.path.isabs(_db_path):
-        script_dir = os.path.dirname(__file__)
-        DB_PATH = os.path.abspath(os.path.join(script_dir, _db_path))
-    else:
-        DB_PATH = _db_path
-else:
-    DB_PATH = None
-
 
 def get_db_connection(db_path=None):
-    """Create a database connection."""
-    path = db_path or DB_PATH
-    if not path:
-        raise ValueError("Database path not defined in environment variables.")
+    """Create a database connection.
+
+    Without an explicit path, the shared connection from database.py is used.
+    """
+    if db_path is None:
+        return database.get_db_connection()
 
-    conn = sqlite3.connect(path)
+    conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
     return conn
 
 
 def backup_database(db_path=None):
     """Create a backup of the database before migration."""
-    path = db_path or DB_PATH
+    path = db_path or database.DB_PATH
     if not path or not os.path.exists(path):
         return None
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_path = f"{path}.{timestamp}.bak"
-    shutil.copy2(path, backup_path)
+    # SQLite backup API: also picks up pages still in the WAL journal
+    source_conn = sqlite3.connect(path)
+    backup_conn = sqlite3.connect(backup_path)
+    try:
+        source_conn.backup(backup_conn)
+    finally:
+        backup_conn.close()
+        source_conn.close()
     logger.info(f"Database backup created: {backup_path}")
     return backup_path
 
@@ -81,6 +77,13 @@ def remove_corners_column(db_path=None):
             )
             return True
 
+        # Indexes are dropped with the old table: recreate them afterwards
+        cursor.execute(
+            "SELECT sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'users' AND sql IS NOT NULL"
+        )
+        index_sqls = [row[0] for row in cursor.fetchall()]
+
         # Begin transaction
         cursor.execute("BEGIN TRANSACTION")
 
@@ -94,7 +97,7 @@ def remove_corners_column(db_path=None):
                 messages INTEGER DEFAULT 0,
                 coins REAL DEFAULT 0,
                 PRIMARY KEY (guildId, userId)
-            )
+            ) WITHOUT ROWID
         """)
 
         # Copy data from old table (excluding corners)
@@ -106,6 +109,8 @@ def remove_corners_column(db_path=None):
         # Drop old table and rename new one
         cursor.execute("DROP TABLE users")
         cursor.execute("ALTER TABLE users_new RENAME TO users")
+        for index_sql in index_sqls:
+            cursor.execute(index_sql)
 
         conn.commit()
         logger.info("Successfully removed 'corners' column from users table.")
@@ -872,6 +877,134 @@ def ensure_table_columns(db_path=None):
         conn.close()
 
 
+def add_youtube_unique_index(db_path=None):
+    """
+    Add a UNIQUE index on youtube_channels(channelId, discordChannelId).
+
+    Duplicate rows left by older versions are removed first, keeping the
+    oldest one, so that /youtube_add can rely on INSERT OR IGNORE.
+    """
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master "
+            "WHERE type = 'index' AND name = 'ux_youtube_channel_discord'"
+        )
+        if cursor.fetchone():
+            return True
+
+        cursor.execute("""
+            DELETE FROM youtube_channels
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM youtube_channels
+                GROUP BY channelId, discordChannelId
+            )
+        """)
+        if cursor.rowcount:
+            logger.info(
+                f"Removed {cursor.rowcount} duplicate row(s) from youtube_channels"
+            )
+
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_youtube_channel_discord
+            ON youtube_channels(channelId, discordChannelId)
+        """)
+
+        conn.commit()
+        logger.info("Unique index on youtube_channels created")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error creating youtube_channels unique index: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+# Tables declared WITHOUT ROWID in database._SCHEMA_DDL
+WITHOUT_ROWID_TABLES = (
+    "users",
+    "counter_game",
+    "moderation_config",
+    "seen_videos",
+    "voice_sessions",
+)
+
+
+def convert_to_without_rowid(db_path=None):
+    """
+    Rebuild tables created by older versions as WITHOUT ROWID tables.
+
+    The current definition (including columns added later) is reused as is,
+    rows whose primary key is NULL are dropped, and the table's indexes are
+    recreated after the swap.
+    """
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+
+    try:
+        converted = []
+        for table in WITHOUT_ROWID_TABLES:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (table,),
+            )
+            row = cursor.fetchone()
+            if not row or "WITHOUT ROWID" in row[0].upper():
+                continue
+
+            cursor.execute(f"PRAGMA table_info({table})")
+            pk_columns = [col[1] for col in cursor.fetchall() if col[5]]
+            if not pk_columns:
+                continue
+
+            cursor.execute(
+                "SELECT sql FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table,),
+            )
+            index_sqls = [r[0] for r in cursor.fetchall()]
+
+            new_table = f"{table}_new"
+            create_sql = re.sub(
+                rf"^CREATE TABLE\s+(IF NOT EXISTS\s+)?[\"']?{table}[\"']?",
+                f"CREATE TABLE {new_table}",
+                row[0],
+                flags=re.IGNORECASE,
+            )
+            not_null = " AND ".join(f"{col} IS NOT NULL" for col in pk_columns)
+
+            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+            cursor.execute(f"{create_sql} WITHOUT ROWID")
+            cursor.execute(
+                f"INSERT OR IGNORE INTO {new_table} "
+                f"SELECT * FROM {table} WHERE {not_null}"
+            )
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+            for index_sql in index_sqls:
+                cursor.execute(index_sql)
+            conn.commit()
+            converted.append(table)
+
+        if converted:
+            logger.info(
+                f"Rebuilt as WITHOUT ROWID tables: {', '.join(converted)}"
+            )
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error converting tables to WITHOUT ROWID: {e}")
+        return False
+    finally:
+        conn.close()
+
+
 def run_all_migrations(db_path=None):
     """Run all migrations in order."""
     logger.info("Starting database migrations...")
@@ -900,6 +1033,12 @@ def run_all_migrations(db_path=None):
     if not ensure_table_columns(db_path):
         logger.warning("Column migration encountered issues")
 
+    if not add_youtube_unique_index(db_path):
+        logger.warning("youtube_channels unique index creation failed")
+
+    if not convert_to_without_rowid(db_path):
+        logger.warning("WITHOUT ROWID table conversion failed")
+
     if success:
         logger.info("All migrations completed successfully!")
     else:
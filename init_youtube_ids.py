@@ -3,18 +3,14 @@
 Script pour initialiser les derniers IDs de vidéos/shorts YouTube
 pour éviter que le bot annonce toutes les anciennes vidéos au démarrage.
 """
-import sqlite3
-import os
-from dotenv import load_dotenv
+import database
 
-load_dotenv()
-db_path = os.getenv('db_path')
-
-if not db_path:
+if not database.DB_PATH:
     print("❌ Erreur: db_path non défini dans .env")
     exit(1)
 
-conn = sqlite3.connect(db_path)
+# Même chemin (relatif au dépôt) et mêmes réglages que le bot
+conn = database.get_db_connection()
 cursor = conn.cursor()
 
 # Récupérer toutes les chaînes YouTube
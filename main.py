@@ -7,6 +7,7 @@ from pathlib import Path
 import signal
 import sqlite3
 import sys
+import time
 
 import aiohttp
 import discord
@@ -121,7 +122,9 @@ except ValueError as e:
 APP_ID = int(os.getenv("app_id", "0"))
 TOKEN = os.getenv("secret_key")
 SERVER_ID = int(os.getenv("server_id", "0"))
-DB_PATH = os.getenv("db_path")
+
+# Durée de conservation des vidéos YouTube déjà traitées (table seen_videos)
+YOUTUBE_SEEN_RETENTION = 7 * 24 * 3600
 
 # Configuration des intents - Optimisé pour réduire la charge WebSocket
 intents = discord.Intents.default()
@@ -225,16 +228,18 @@ class ISROBOT(commands.Bot):
             import database
 
             conn = database.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM counter_game WHERE guildId = ?", (str(SERVER_ID),)
-            )
-            result = cursor.fetchone()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT * FROM counter_game WHERE guildId = ?", (str(SERVER_ID),)
+                )
+                result = cursor.fetchone()
+            finally:
+                conn.close()
             if result:
                 logger.debug("Le minijeux du compteur est déjà configuré")
             else:
                 logger.debug("Le minijeux du compteur n'est pas configuré")
-            conn.close()
         except Exception as e:
             logger.error(
                 f"Erreur lors de la vérification du minijeux du compteur: {e}",
@@ -269,27 +274,17 @@ class ISROBOT(commands.Bot):
                 if self.session:
                     stream_checker = CheckTwitchStatus(self.session)
 
-                    # Récupérer tous les streamers de la base de données
-                    conn = database.get_db_connection()
-                    try:
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT * FROM streamers")
-                        streamers = cursor.fetchall()
-                    finally:
-                        conn.close()
+                    # Récupérer les streamers depuis la copie en mémoire du cog
+                    stream_cog = self.get_cog("Stream")
+                    streamers = stream_cog.get_streamers() if stream_cog else []
 
                     logger.debug(f"[Twitch] Vérification de {len(streamers)} streamer(s)")
 
-                    for streamer in streamers:
+                    for streamer_id, streamer in streamers:
                         try:
-                            # Database schema: streamers table
-                            # [0]=id, [1]=streamerName, [2]=streamChannelId,
-                            # [3]=roleId, [4]=announced, [5]=startTime
-
-                            streamer_id = streamer[0]
-                            streamer_name = streamer[1]
-                            stream_channel_id = streamer[2]
-                            announced = streamer[4]
+                            streamer_name = streamer["streamerName"]
+                            stream_channel_id = streamer["streamChannelId"]
+                            announced = streamer["announced"]
 
                             logger.debug(
                                 f"[Twitch] Vérification du statut de {streamer_name}"
@@ -338,6 +333,7 @@ class ISROBOT(commands.Bot):
                                                 (streamer_id,),
                                             )
                                             conn.commit()
+                                            streamer["announced"] = 1
                                             logger.info(
                                                 f"Annonce envoyée pour le streamer {streamer_name}"
                                             )
@@ -362,6 +358,7 @@ class ISROBOT(commands.Bot):
                                             (streamer_id,),
                                         )
                                         conn.commit()
+                                        streamer["announced"] = 0
                                         logger.debug(
                                             f"Statut réinitialisé pour le streamer {streamer_name}"
                                         )
@@ -369,15 +366,15 @@ class ISROBOT(commands.Bot):
                                         conn.close()
                         except asyncio.TimeoutError:
                             logger.warning(
-                                f"Timeout lors de la vérification du streamer {streamer[1]}"
+                                f"Timeout lors de la vérification du streamer {streamer['streamerName']}"
                             )
                         except aiohttp.ClientError as e:
                             logger.error(
-                                f"Erreur réseau lors de la vérification du streamer {streamer[1]}: {e}"
+                                f"Erreur réseau lors de la vérification du streamer {streamer['streamerName']}: {e}"
                             )
                         except Exception as e:
                             logger.error(
-                                f"Erreur lors de la vérification du streamer {streamer[1]}: {e}"
+                                f"Erreur lors de la vérification du streamer {streamer['streamerName']}: {e}"
                             )
 
             except asyncio.TimeoutError:
@@ -434,28 +431,81 @@ class ISROBOT(commands.Bot):
                 if self.session:
                     youtube_checker = CheckYouTubeChannel(self.session)
 
-                    # Récupérer toutes les chaînes YouTube de la base de données
+                    # Récupérer les chaînes depuis la copie en mémoire du cog
+                    youtube_cog = self.get_cog("YouTube")
+                    channels = youtube_cog.get_channels() if youtube_cog else []
+
+                    logger.debug(f"[YouTube] Vérification de {len(channels)} chaîne(s)")
+
+                    # Seules les chaînes avec au moins une notification active
+                    # sont interrogées
+                    watched_ids = list(
+                        {
+                            row["channelId"]
+                            for _, row in channels
+                            if row["notifyVideos"] or row["notifyShorts"]
+                        }
+                    )
+
+                    # Playlists d'uploads de toutes les chaînes en une requête par
+                    # lot de 50, au lieu d'une requête par chaîne
+                    uploads_playlists = {}
+                    if watched_ids:
+                        try:
+                            uploads_playlists = (
+                                await youtube_checker.get_uploads_playlist_ids(
+                                    watched_ids
+                                )
+                            )
+                        except Exception as e:
+                            logger.warning(
+                                f"[YouTube] Récupération groupée des playlists impossible, "
+                                f"repli sur une requête par chaîne: {e}"
+                            )
+
+                    # Derniers uploads de toutes les chaînes en parallèle
+                    uploads_by_channel = (
+                        await youtube_checker.get_latest_uploads_many(
+                            watched_ids,
+                            max_results=3,
+                            uploads_playlists=uploads_playlists,
+                        )
+                    )
+
+                    # Vidéos déjà traitées : abonnement -> {videoId: isShort}.
+                    # Les entrées de plus de 7 jours (bien au-delà de la fenêtre
+                    # de 24h des annonces) sont purgées au passage.
+                    now_ts = int(time.time())
                     conn = database.get_db_connection()
                     try:
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT * FROM youtube_channels")
-                        channels = cursor.fetchall()
+                        conn.execute(
+                            "DELETE FROM seen_videos WHERE ts < ?",
+                            (now_ts - YOUTUBE_SEEN_RETENTION,),
+                        )
+                        conn.commit()
+                        seen_rows = conn.execute(
+                            "SELECT subscriptionId, videoId, isShort FROM seen_videos"
+                        ).fetchall()
                     finally:
                         conn.close()
-
-                    logger.debug(f"[YouTube] Vérification de {len(channels)} chaîne(s)")
-
-                    for channel_data in channels:
+                    seen_videos = {}
+                    for row in seen_rows:
+                        seen_videos.setdefault(row[0], {})[row[1]] = bool(row[2])
+                    # Vidéos traitées pendant ce passage, enregistrées à la fin
+                    newly_seen = []
+                    # Un seul annonceur par passage : ses embeds sont partagés entre
+                    # les salons qui suivent la même chaîne
+                    announcer = AnnounceYouTube(self)
+
+                    for subscription_id, channel_data in channels:
                         try:
-                            channel_id = channel_data[1]  # channelId
-                            channel_name = channel_data[2]  # channelName
-                            discord_channel_id = int(
-                                channel_data[3]
-                            )  # discordChannelId
-                            last_video_id = channel_data[5]  # lastVideoId
-                            last_short_id = channel_data[6]  # lastShortId
-                            notify_videos = channel_data[8]  # notifyVideos
-                            notify_shorts = channel_data[9]  # notifyShorts
+                            channel_id = channel_data["channelId"]
+                            channel_name = channel_data["channelName"]
+                            discord_channel_id = int(channel_data["discordChannelId"])
+                            last_video_id = channel_data["lastVideoId"]
+                            last_short_id = channel_data["lastShortId"]
+                            notify_videos = channel_data["notifyVideos"]
+                            notify_shorts = channel_data["notifyShorts"]
 
                             logger.debug(
                                 f"[YouTube] Vérification de {channel_name} "
@@ -488,8 +538,6 @@ class ISROBOT(commands.Bot):
                                     )
                                     continue
 
-                            announcer = AnnounceYouTube(self)
-
                             # Vérifier si au moins un type de notification est activé
                             if not notify_videos and not notify_shorts:
                                 logger.warning(
@@ -505,11 +553,12 @@ class ISROBOT(commands.Bot):
                                     f"shorts: {notify_shorts})"
                                 )
                                 try:
-                                    latest_uploads = (
-                                        await youtube_checker.get_latest_uploads(
-                                            channel_id, max_results=3
-                                        )
+                                    latest_uploads = uploads_by_channel.get(
+                                        channel_id, []
                                     )
+                                    # Erreur survenue pendant la récupération groupée
+                                    if isinstance(latest_uploads, BaseException):
+                                        raise latest_uploads
 
                                     # Track the newest content to announce (only one of each type per cycle)
                                     newest_video_to_announce = None
@@ -534,6 +583,27 @@ class ISROBOT(commands.Bot):
                                             f"trouvée(s) pour {channel_name}"
                                         )
 
+                                    # Détails des uploads récents encore inconnus en
+                                    # une seule requête
+                                    row_seen = seen_videos.get(subscription_id, {})
+                                    recent_ids = []
+                                    for upload in latest_uploads:
+                                        if not self._is_recently_published(
+                                            upload["snippet"].get("publishedAt", ""),
+                                            hours=24,
+                                        ):
+                                            break
+                                        video_id = upload["snippet"]["resourceId"][
+                                            "videoId"
+                                        ]
+                                        if video_id not in row_seen:
+                                            recent_ids.append(video_id)
+                                    videos_details = (
+                                        await youtube_checker.get_videos_details(
+                                            recent_ids
+                                        )
+                                    )
+
                                     # First pass: identify all new content and find the newest of each type
                                     for upload in latest_uploads:
                                         video_id = upload["snippet"]["resourceId"][
@@ -556,12 +626,19 @@ class ISROBOT(commands.Bot):
                                             # Stop checking: all subsequent items will be older than this one
                                             break
 
+                                        # Vidéo déjà traitée lors d'un passage
+                                        # précédent : elle et les contenus plus
+                                        # anciens de son type sont connus, inutile
+                                        # de redemander ses détails
+                                        if video_id in row_seen:
+                                            if row_seen[video_id]:
+                                                found_last_short = True
+                                            else:
+                                                found_last_video = True
+                                            continue
+
                                         # Récupérer les détails de la vidéo pour déterminer si c'est un short
-                                        video_details = (
-                                            await youtube_checker.get_video_details(
-                                                video_id
-                                            )
-                                        )
+                                        video_details = videos_details.get(video_id)
                                         if not video_details:
                                             logger.warning(
                                                 f"[YouTube] Impossible de récupérer les détails "
@@ -578,6 +655,14 @@ class ISROBOT(commands.Bot):
                                         ]
 
                                         is_short_video = is_short(duration)
+                                        newly_seen.append(
+                                            (
+                                                subscription_id,
+                                                video_id,
+                                                int(is_short_video),
+                                                now_ts,
+                                            )
+                                        )
                                         content_type = (
                                             "short" if is_short_video else "vidéo"
                                         )
@@ -703,10 +788,14 @@ class ISROBOT(commands.Bot):
                                                 (
                                                     most_recent_video_id,
                                                     most_recent_short_id,
-                                                    channel_data[0],
+                                                    subscription_id,
                                                 ),
                                             )
                                             conn.commit()
+                                            channel_data.update(
+                                                lastVideoId=most_recent_video_id,
+                                                lastShortId=most_recent_short_id,
+                                            )
                                             logger.info(
                                                 f"IDs mis à jour pour {channel_name}: "
                                                 f"lastVideoId={most_recent_video_id}, "
@@ -733,7 +822,8 @@ class ISROBOT(commands.Bot):
                                                 ],
                                             )
                                             logger.info(
-                                                f"Annonce short envoyée pour {channel_name}"
+                                                f"Annonce short mise en file d'envoi "
+                                                f"pour {channel_name}"
                                             )
                                         except Exception as e:
                                             logger.error(
@@ -754,17 +844,14 @@ class ISROBOT(commands.Bot):
                                                 ],
                                             )
                                             logger.info(
-                                                f"Annonce vidéo envoyée pour {channel_name}"
+                                                f"Annonce vidéo mise en file d'envoi "
+                                                f"pour {channel_name}"
                                             )
                                         except Exception as e:
                                             logger.error(
                                                 f"Erreur lors de l'annonce de la vidéo pour {channel_name}: {e}"
                                             )
 
-                                except discord.errors.Forbidden as e:
-                                    logger.error(
-                                        f"Permission Discord refusée pour {channel_name} lors de l'annonce d'une vidéo/short: {e}"
-                                    )
                                 except asyncio.TimeoutError:
                                     logger.warning(
                                         f"Timeout lors de la vérification des uploads pour {channel_name}"
@@ -780,17 +867,24 @@ class ISROBOT(commands.Bot):
 
                         except asyncio.TimeoutError:
                             logger.warning(
-                                f"Timeout lors de la vérification de la chaîne {channel_data[2]}"
+                                f"Timeout lors de la vérification de la chaîne {channel_data['channelName']}"
                             )
                         except aiohttp.ClientError as e:
                             logger.error(
-                                f"Erreur réseau lors de la vérification de la chaîne {channel_data[2]}: {e}"
+                                f"Erreur réseau lors de la vérification de la chaîne {channel_data['channelName']}: {e}"
                             )
                         except Exception as e:
                             logger.error(
-                                f"Erreur lors de la vérification de la chaîne {channel_data[2]}: {e}"
+                                f"Erreur lors de la vérification de la chaîne {channel_data['channelName']}: {e}"
                             )
 
+                    if newly_seen:
+                        database.bulk_execute(
+                            "INSERT OR IGNORE INTO seen_videos "
+                            "(subscriptionId, videoId, isShort, ts) VALUES (?, ?, ?, ?)",
+                            newly_seen,
+                        )
+
             except asyncio.TimeoutError:
                 logger.warning("Timeout global lors de la vérification YouTube")
             except aiohttp.ClientError as e:
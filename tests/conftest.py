@@ -0,0 +1,20 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import threading
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def bot_db(tmp_path, monkeypatch):
+    """Point database.py to a fresh database file with the bot schema."""
+    db_path = str(tmp_path / "bot.db")
+    monkeypatch.setattr(database, "_resolve_db_path", lambda: db_path)
+    monkeypatch.setattr(database, "_pool", threading.local())
+    database.create_database()
+    yield db_path
+    database._close_pooled_connections()
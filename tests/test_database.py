@@ -0,0 +1,136 @@
+"""
+Tests for the per-thread connection pool of database.py.
+
+This module tests:
+- get_db_connection: the thread's connection reused once closed
+- get_db_connection: a nested call getting an independent connection
+- close(): returning the connection from another thread than its owner
+- A borrowed connection lost without close() releasing its write lock
+"""
+
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+class TestConnectionPool:
+    """Tests for the reuse of pooled connections."""
+
+    def test_connection_reused_after_close(self, bot_db):
+        """Closing the connection returns it to the pool for the next call."""
+        conn = database.get_db_connection()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.close()
+
+        again = database.get_db_connection()
+        try:
+            assert again is conn
+            # The connection is still usable after being returned
+            assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        finally:
+            again.close()
+
+    def test_nested_call_gets_independent_connection(self, bot_db):
+        """A connection borrowed by the caller is never handed out twice."""
+        outer = database.get_db_connection()
+        inner = database.get_db_connection()
+        try:
+            assert inner is not outer
+        finally:
+            inner.close()
+            outer.close()
+
+        # Only one free connection is kept per thread
+        again = database.get_db_connection()
+        try:
+            assert again is inner
+        finally:
+            again.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            outer.execute("SELECT 1")
+
+    def test_connection_lost_before_close_releases_lock(self, bot_db):
+        """A borrower that raises before close() does not keep the write lock."""
+        setup = sqlite3.connect(bot_db)
+        setup.execute("CREATE TABLE t (x INTEGER)")
+        setup.close()
+
+        def failing_borrower():
+            conn = database.get_db_connection()
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+
+        try:
+            failing_borrower()
+        except RuntimeError:
+            pass
+        gc.collect()
+
+        other = sqlite3.connect(bot_db, timeout=0.1)
+        try:
+            other.execute("INSERT INTO t VALUES (2)")
+            other.commit()
+        finally:
+            other.close()
+
+        # The thread still gets a working connection from the pool
+        conn = database.get_db_connection()
+        try:
+            assert [row[0] for row in conn.execute("SELECT x FROM t")] == [2]
+        finally:
+            conn.close()
+
+    def test_uncommitted_changes_rolled_back_on_close(self, bot_db):
+        """Close and reopen: a transaction left open is not kept."""
+        conn = database.get_db_connection()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.close()
+
+        reopened = database.get_db_connection()
+        try:
+            assert reopened is conn
+            assert not reopened.in_transaction
+            assert reopened.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        finally:
+            reopened.close()
+
+    def test_close_from_other_thread_frees_owner_connection(self, bot_db):
+        """A connection closed by a worker thread is reused by its owner."""
+        conn = database.get_db_connection()
+        worker = threading.Thread(target=conn.close)
+        worker.start()
+        worker.join()
+
+        again = database.get_db_connection()
+        try:
+            assert again is conn
+        finally:
+            again.close()
+
+    def test_threads_get_their_own_connection(self, bot_db):
+        """Each thread opens and reuses its own pooled connection."""
+        main_conn = database.get_db_connection()
+        main_conn.close()
+        seen = []
+
+        def worker():
+            first = database.get_db_connection()
+            first.close()
+            second = database.get_db_connection()
+            second.close()
+            seen.extend([first, second])
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        assert seen[0] is seen[1]
+        assert seen[0] is not main_conn
+        assert database.get_db_connection() is main_conn
+        main_conn.close()
@@ -237,3 +237,49 @@ class TestEnsureTableColumns:
             assert "startTime" in col_names
         finally:
             os.unlink(db_path)
+
+
+class TestConvertToWithoutRowid:
+    """Tests for the WITHOUT ROWID table rebuild."""
+
+    def test_rebuilds_table_and_keeps_rows_and_indexes(self):
+        """Legacy rowid tables are rebuilt with their data and indexes."""
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+        try:
+            conn = sqlite3.connect(db_path)
+            conn.execute("""
+                CREATE TABLE users (
+                    guildId TEXT NOT NULL,
+                    userId TEXT NOT NULL,
+                    xp REAL DEFAULT 0,
+                    PRIMARY KEY (guildId, userId)
+                )
+            """)
+            conn.execute("CREATE INDEX idx_users_guild_xp ON users(guildId, xp DESC)")
+            conn.execute("INSERT INTO users VALUES ('1', '2', 50), ('1', '3', 70)")
+            conn.commit()
+            conn.close()
+
+            from db_migrations import convert_to_without_rowid
+
+            assert convert_to_without_rowid(db_path) is True
+            # Already converted: nothing to do
+            assert convert_to_without_rowid(db_path) is True
+
+            conn = sqlite3.connect(db_path)
+            table_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'users'"
+            ).fetchone()[0]
+            index = conn.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'idx_users_guild_xp'"
+            ).fetchone()
+            rows = conn.execute("SELECT * FROM users ORDER BY userId").fetchall()
+            conn.close()
+
+            assert table_sql.upper().endswith("WITHOUT ROWID")
+            assert index is not None
+            assert rows == [("1", "2", 50.0), ("1", "3", 70.0)]
+        finally:
+            os.unlink(db_path)
@@ -0,0 +1,148 @@
+"""
+Tests for the moderation helpers.
+
+This module tests:
+- get_expired_mutes: expiry heap popping each expired mute once
+- get_moderation_config: TTL cache invalidated by set_moderation_config
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import database
+from utils import moderation_utils
+
+
+@pytest.fixture
+def moderation_db(bot_db, monkeypatch):
+    """Bot database with the module caches of moderation_utils reset."""
+    monkeypatch.setattr(moderation_utils, "_mute_heap", [])
+    monkeypatch.setattr(moderation_utils, "_mute_heap_loaded", False)
+    monkeypatch.setattr(moderation_utils, "_config_cache", {})
+    return bot_db
+
+
+def _insert_mute(db_path, guild_id, user_id, expires_in):
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            """
+            INSERT INTO active_mutes
+            (guild_id, user_id, moderator_id, reason, expires_at, created_at)
+            VALUES (?, ?, NULL, 'test', ?, ?)
+        """,
+            (guild_id, user_id, expires_at.isoformat(), expires_at.isoformat()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _count_connections(monkeypatch):
+    """Count the calls to database.get_db_connection."""
+    calls = []
+    get_db_connection = database.get_db_connection
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return get_db_connection(*args, **kwargs)
+
+    monkeypatch.setattr(database, "get_db_connection", counting)
+    return calls
+
+
+class TestExpiredMutes:
+    """Tests for the mute expiry heap."""
+
+    def test_expired_mute_popped_once(self, moderation_db, monkeypatch):
+        """An expired mute is returned until removed, then never again."""
+        _insert_mute(moderation_db, "1", "10", -60)
+        _insert_mute(moderation_db, "1", "20", 3600)
+
+        expired = moderation_utils.get_expired_mutes()
+        assert [(m["guild_id"], m["user_id"]) for m in expired] == [("1", "10")]
+
+        # Still due while it has not been removed
+        expired = moderation_utils.get_expired_mutes()
+        assert [(m["guild_id"], m["user_id"]) for m in expired] == [("1", "10")]
+
+        assert moderation_utils.remove_mute("1", "10", None, "expired")
+        assert moderation_utils.get_expired_mutes() == []
+        # Only the mute still running is left in the heap
+        assert [entry[1:] for entry in moderation_utils._mute_heap] == [("1", "20")]
+
+        # Nothing due: the heap answers without querying the database
+        calls = _count_connections(monkeypatch)
+        assert moderation_utils.get_expired_mutes() == []
+        assert calls == []
+
+    def test_extended_mute_not_returned_again(self, moderation_db):
+        """The stale entry of an extended mute is dropped without a result."""
+        _insert_mute(moderation_db, "1", "10", -60)
+        assert len(moderation_utils.get_expired_mutes()) == 1
+
+        # Muted again before the expiry was handled: the old entry stays queued
+        moderation_utils.add_mute("1", "10", None, "extended", 3600)
+        assert len(moderation_utils._mute_heap) == 2
+
+        assert moderation_utils.get_expired_mutes() == []
+        assert len(moderation_utils._mute_heap) == 1
+        assert moderation_utils.get_active_mute("1", "10") is not None
+
+
+class TestModerationConfigCache:
+    """Tests for the cached moderation configuration."""
+
+    def test_config_served_from_cache(self, moderation_db, monkeypatch):
+        """A second read within the TTL does not query the database."""
+        moderation_utils.set_moderation_config("1", "log_channel_id", "123")
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "123"
+
+        calls = _count_connections(monkeypatch)
+        config = moderation_utils.get_moderation_config("1")
+        assert config["log_channel_id"] == "123"
+        assert calls == []
+
+        # Callers get a copy: changing it does not alter the cache
+        config["log_channel_id"] = "999"
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "123"
+
+    def test_missing_config_cached(self, moderation_db, monkeypatch):
+        """A guild without configuration is cached as None."""
+        assert moderation_utils.get_moderation_config("1") is None
+
+        calls = _count_connections(monkeypatch)
+        assert moderation_utils.get_moderation_config("1") is None
+        assert calls == []
+
+    def test_set_config_invalidates_cache(self, moderation_db):
+        """set_moderation_config makes the next read see the new value."""
+        assert moderation_utils.get_moderation_config("1") is None
+
+        moderation_utils.set_moderation_config("1", "log_channel_id", "123")
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "123"
+
+        moderation_utils.set_moderation_config("1", "log_channel_id", "456")
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "456"
+
+    def test_cache_expires_after_ttl(self, moderation_db, monkeypatch):
+        """A change made outside the module is seen once the TTL has elapsed."""
+        moderation_utils.set_moderation_config("1", "log_channel_id", "123")
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "123"
+
+        conn = sqlite3.connect(moderation_db)
+        conn.execute("UPDATE moderation_config SET log_channel_id = '456'")
+        conn.commit()
+        conn.close()
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "123"
+
+        now = moderation_utils.time.monotonic()
+        monkeypatch.setattr(
+            moderation_utils.time,
+            "monotonic",
+            lambda: now + moderation_utils.CONFIG_CACHE_TTL + 1,
+        )
+        assert moderation_utils.get_moderation_config("1")["log_channel_id"] == "456"
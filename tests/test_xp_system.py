@@ -0,0 +1,215 @@
+"""
+Tests for the batched message XP writes of the XP cog.
+
+This module tests:
+- flush_xp: pending gains written with one UPSERT per user
+- flush_xp: gains re-queued when the write fails
+- Level consistency when another module changes XP between flushes
+- Stats cache kept across flushes and pruned once idle
+- cog_unload waiting for a write still running before closing the connection
+"""
+
+import asyncio
+import sqlite3
+import types
+
+import pytest
+
+import db_helpers
+from commands import xp_system
+from db_migrations import create_minigame_tables
+
+
+@pytest.fixture
+def xp_db(bot_db):
+    """Bot database with the transactions ledger used by db_helpers.spend_xp."""
+    create_minigame_tables(bot_db)
+    return bot_db
+
+
+def _run_with_cog(scenario):
+    """Run ``scenario(cog)`` with an XP cog whose flush loop is stopped."""
+
+    async def main():
+        cog = xp_system.XPSystem(types.SimpleNamespace())
+        cog.flush_xp_loop.cancel()
+        try:
+            return await scenario(cog)
+        finally:
+            await cog.cog_unload()
+
+    return asyncio.run(main())
+
+
+def _user_row(db_path, guild_id, user_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT xp, level, messages FROM users WHERE guildId = ? AND userId = ?",
+            (str(guild_id), str(user_id)),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+class TestFlushXp:
+    """Tests for the batched XP flush."""
+
+    def test_pending_gains_written_in_one_batch(self, xp_db):
+        """Several gains are summed and written in a single UPSERT batch."""
+        batches = []
+
+        async def scenario(cog):
+            write = cog._write_xp_rows
+
+            def recording_write(rows):
+                batches.append(list(rows))
+                write(rows)
+
+            cog._write_xp_rows = recording_write
+            await cog.add_user_xp(1, 10, 100)
+            await cog.add_user_xp(1, 10, 50)
+            await cog.add_user_xp(1, 20, 30)
+            await cog.flush_xp()
+            # Nothing left to write
+            await cog.flush_xp()
+
+        _run_with_cog(scenario)
+
+        assert len(batches) == 1
+        assert sorted(batches[0]) == [(1, 10, 150, 2), (1, 20, 30, 1)]
+        assert _user_row(xp_db, 1, 10) == (150.0, 2, 2)
+        assert _user_row(xp_db, 1, 20) == (30.0, 1, 1)
+
+    def test_gains_requeued_on_error(self, xp_db):
+        """A failed write keeps the gains pending for the next flush."""
+
+        async def scenario(cog):
+            write = cog._write_xp_rows
+
+            def failing_write(rows):
+                raise sqlite3.OperationalError("database is locked")
+
+            await cog.add_user_xp(1, 10, 100)
+            cog._write_xp_rows = failing_write
+            await cog.flush_xp()
+            assert cog._dirty == {(1, 10): [100, 1]}
+
+            # A gain made after the failure is merged with the re-queued one
+            await cog.add_user_xp(1, 10, 25)
+            cog._write_xp_rows = write
+            await cog.flush_xp()
+            assert cog._dirty == {}
+
+        _run_with_cog(scenario)
+
+        assert _user_row(xp_db, 1, 10) == (125.0, 2, 2)
+
+    def test_level_follows_xp_changed_by_other_module(self, xp_db):
+        """XP spent elsewhere between flushes is reflected in the level."""
+
+        async def scenario(cog):
+            first = await cog.add_user_xp(1, 10, 2000)
+            await cog.flush_xp()
+            await cog.add_user_xp(1, 10, 10)
+
+            # Shop purchase between two flushes
+            db_helpers.spend_xp("1", "10", 1500)
+            await cog.flush_xp()
+            flushed = _user_row(xp_db, 1, 10)
+
+            after = await cog.add_user_xp(1, 10, 10)
+            return first, flushed, after
+
+        first, flushed, after = _run_with_cog(scenario)
+
+        assert first["new_level"] == 5
+        assert flushed[:2] == (510.0, 3)
+        assert after["new_xp"] == 520.0
+        assert after["new_level"] == 3
+        assert after["level_up"] is False
+
+
+class TestXpCache:
+    """Tests for the in-memory stats cache."""
+
+    def test_stats_kept_after_flush(self, xp_db):
+        """A user's next gain after a flush does not read the database again."""
+
+        async def scenario(cog):
+            reads = []
+            fetch = cog._fetch
+
+            def counting_fetch(*args, **kwargs):
+                reads.append(args)
+                return fetch(*args, **kwargs)
+
+            cog._fetch = counting_fetch
+            await cog.add_user_xp(1, 10, 100)
+            await cog.flush_xp()
+            after = await cog.add_user_xp(1, 10, 20)
+            return reads, after
+
+        reads, after = _run_with_cog(scenario)
+
+        assert len(reads) == 1
+        assert after["new_xp"] == 120
+        assert after["messages"] == 2
+
+    def test_idle_stats_pruned(self, xp_db, monkeypatch):
+        """Stats unused for XP_CACHE_IDLE are dropped, pending ones are kept."""
+
+        async def scenario(cog):
+            await cog.add_user_xp(1, 10, 100)
+            await cog.flush_xp()
+            await cog.add_user_xp(1, 20, 50)
+
+            now = xp_system.time.monotonic()
+            monkeypatch.setattr(
+                xp_system.time,
+                "monotonic",
+                lambda: now + xp_system.XP_CACHE_IDLE + 1,
+            )
+            cog.prune_xp_cache()
+            cached = set(cog._xp_cache)
+
+            # Reloaded from the database on the next gain
+            after = await cog.add_user_xp(1, 10, 10)
+            return cached, after
+
+        cached, after = _run_with_cog(scenario)
+
+        assert cached == {(1, 20)}
+        assert after["new_xp"] == 110.0
+
+
+class TestUnload:
+    """Tests for the cog shutdown."""
+
+    def test_unload_waits_for_running_write(self, xp_db):
+        """A write still running in its thread is not cut off by the unload."""
+
+        async def main():
+            cog = xp_system.XPSystem(types.SimpleNamespace())
+            cog.flush_xp_loop.cancel()
+            await cog.add_user_xp(1, 10, 100)
+
+            # Write in progress on another thread, holding the connection lock
+            cog._db_lock.acquire()
+            rows = [(1, 10, 100, 1)]
+            cog._dirty.clear()
+
+            def finish_write():
+                with cog.conn:
+                    cog.conn.executemany(xp_system._UPSERT_SQL, rows)
+                cog._db_lock.release()
+
+            unload = asyncio.create_task(cog.cog_unload())
+            await asyncio.sleep(0.05)
+            assert not unload.done()
+            await asyncio.to_thread(finish_write)
+            await unload
+
+        asyncio.run(main())
+
+        assert _user_row(xp_db, 1, 10) == (100.0, 1, 1)
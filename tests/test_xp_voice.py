@@ -0,0 +1,195 @@
+"""
+Tests for the voice XP cog.
+
+This module tests:
+- Award timing: full hours credited, partial hour kept, AFK members retried
+- Retry after a failed write, without stopping the award loop
+- Restoring saved sessions after a restart
+"""
+
+import asyncio
+import sqlite3
+import time
+import types
+
+import pytest
+
+from commands import xp_voice
+
+GUILD_ID = 1
+VOICE_CHANNEL_ID = 50
+AFK_CHANNEL_ID = 99
+
+
+class FakeGuild:
+    """Minimal guild exposing the member cache used by the cog."""
+
+    def __init__(self, members):
+        self.id = GUILD_ID
+        self.afk_channel = types.SimpleNamespace(id=AFK_CHANNEL_ID)
+        self._members = members
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+
+def _member(user_id, channel_id=VOICE_CHANNEL_ID):
+    voice = None
+    if channel_id is not None:
+        voice = types.SimpleNamespace(channel=types.SimpleNamespace(id=channel_id))
+    return types.SimpleNamespace(id=user_id, bot=False, voice=voice)
+
+
+def _make_bot(guild):
+    async def wait_until_ready():
+        return None
+
+    return types.SimpleNamespace(
+        get_guild=lambda guild_id: guild if guild_id == guild.id else None,
+        guilds=[guild],
+        wait_until_ready=wait_until_ready,
+    )
+
+
+def _run_with_cog(bot, scenario):
+    """Run ``scenario(cog)`` with a voice cog whose loop is stopped."""
+
+    async def main():
+        cog = xp_voice.VoiceXP(bot)
+        cog.voice_award_loop.cancel()
+        try:
+            return await scenario(cog)
+        finally:
+            await cog.cog_unload()
+
+    return asyncio.run(main())
+
+
+def _query(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+class TestVoiceAwards:
+    """Tests for the periodic voice XP awards."""
+
+    def test_full_hours_awarded_and_partial_hour_kept(self, bot_db):
+        """Two full hours are credited and the next award is one period later."""
+        bot = _make_bot(FakeGuild({10: _member(10)}))
+
+        async def scenario(cog):
+            last_ts = time.time() - 2 * xp_voice.VOICE_XP_PERIOD - 100
+            cog._start_session((GUILD_ID, 10), last_ts)
+            await cog.voice_award_loop.coro(cog)
+            return last_ts, cog.sessions[(GUILD_ID, 10)], min(cog._due)
+
+        last_ts, new_ts, next_due = _run_with_cog(bot, scenario)
+
+        assert new_ts == last_ts + 2 * xp_voice.VOICE_XP_PERIOD
+        assert next_due == (new_ts + xp_voice.VOICE_XP_PERIOD, (GUILD_ID, 10))
+        ((xp, level),) = _query(bot_db, "SELECT xp, level FROM users")
+        assert 2 * xp_voice.VOICE_XP_MIN <= xp <= 2 * xp_voice.VOICE_XP_MAX
+        assert level == 1
+
+    def test_afk_member_retried_later_without_xp(self, bot_db):
+        """A member in the AFK channel gets no XP and is checked again later."""
+        bot = _make_bot(FakeGuild({10: _member(10, AFK_CHANNEL_ID)}))
+
+        async def scenario(cog):
+            now = time.time()
+            cog._start_session((GUILD_ID, 10), now - xp_voice.VOICE_XP_PERIOD - 1)
+            await cog.voice_award_loop.coro(cog)
+            return now, min(cog._due)
+
+        now, (retry_at, key) = _run_with_cog(bot, scenario)
+
+        assert key == (GUILD_ID, 10)
+        assert now + xp_voice.VOICE_RETRY_DELAY <= retry_at
+        assert retry_at < now + xp_voice.VOICE_RETRY_DELAY + 60
+        assert _query(bot_db, "SELECT xp FROM users") == []
+
+    def test_failed_write_retried_and_loop_kept_alive(self, bot_db):
+        """A locked database neither loses the session nor stops the loop."""
+        bot = _make_bot(FakeGuild({10: _member(10)}))
+
+        async def scenario(cog):
+            flush = cog._flush_xp_batch
+
+            def locked(*args, **kwargs):
+                raise sqlite3.OperationalError("database is locked")
+
+            now = time.time()
+            last_ts = now - xp_voice.VOICE_XP_PERIOD - 1
+            cog._start_session((GUILD_ID, 10), last_ts)
+            cog._flush_xp_batch = locked
+            await cog.voice_award_loop.coro(cog)
+            unchanged = cog.sessions[(GUILD_ID, 10)] == last_ts
+            retry_at = min(cog._due)[0]
+
+            # Nothing due: only the pending sessions are saved, and fail again
+            await cog.voice_award_loop.coro(cog)
+            cog._flush_xp_batch = flush
+            return now, unchanged, retry_at
+
+        now, unchanged, retry_at = _run_with_cog(bot, scenario)
+
+        assert unchanged
+        assert now + xp_voice.VOICE_RETRY_DELAY <= retry_at
+        assert _query(bot_db, "SELECT xp FROM users") == []
+        # Sessions saved once the database is available again (on unload)
+        assert _query(bot_db, "SELECT guildId, userId FROM voice_sessions") == [
+            (GUILD_ID, 10)
+        ]
+
+
+class TestVoiceSessionRestore:
+    """Tests for sessions restored after a restart."""
+
+    def test_restore_keeps_only_the_partial_hour(self, bot_db):
+        """Downtime is not credited: only the started hour is carried over."""
+        now = time.time()
+        conn = sqlite3.connect(bot_db)
+        conn.executemany(
+            "INSERT INTO voice_sessions (guildId, userId, last_ts) VALUES (?, ?, ?)",
+            [
+                # Three hours of downtime plus a 10-minute partial hour
+                (GUILD_ID, 10, now - 3 * xp_voice.VOICE_XP_PERIOD - 600),
+                # No longer in a voice channel
+                (GUILD_ID, 20, now - 600),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        bot = _make_bot(FakeGuild({10: _member(10), 20: _member(20, None)}))
+
+        async def scenario(cog):
+            await cog.before_voice_award_loop()
+            await cog.voice_award_loop.coro(cog)
+            return dict(cog.sessions)
+
+        sessions = _run_with_cog(bot, scenario)
+
+        assert list(sessions) == [(GUILD_ID, 10)]
+        assert sessions[(GUILD_ID, 10)] == pytest.approx(now - 600, abs=5)
+        assert _query(bot_db, "SELECT xp FROM users") == []
+        assert _query(bot_db, "SELECT guildId, userId FROM voice_sessions") == [
+            (GUILD_ID, 10)
+        ]
+
+    def test_restored_award_ts(self):
+        """The restored timestamp never lies more than one period in the past."""
+        period = xp_voice.VOICE_XP_PERIOD
+        restored = xp_voice.VoiceXP._restored_award_ts
+
+        assert restored(None, 10_000.0) == 10_000.0
+        assert restored(20_000.0, 10_000.0) == 10_000.0
+        assert restored(10_000.0 - 600, 10_000.0) == 10_000.0 - 600
+        assert restored(10_000.0 - 5 * period - 600, 10_000.0) == 10_000.0 - 600
@@ -3,7 +3,9 @@ Utility functions for the moderation system.
 Handles database operations, notifications, and helper functions.
 """
 
+import heapq
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -13,6 +15,18 @@ import database
 
 logger = logging.getLogger(__name__)
 
+# Lifetime (seconds) of the cached moderation configuration
+CONFIG_CACHE_TTL = 300
+
+# guild_id -> (monotonic expiry, configuration or None)
+_config_cache: dict = {}
+
+# Heap of (ISO expires_at, guild_id, user_id) for active mutes, loaded on the
+# first get_expired_mutes call. Stale entries (mute removed or extended) are
+# not deleted: they are skipped when they reach the top.
+_mute_heap: list = []
+_mute_heap_loaded = False
+
 
 # --- Database Helper Functions ---
 
@@ -143,14 +157,16 @@ def get_warning_history(guild_id: str, user_id: str, limit: int = 100) -> list:
         limit: Maximum number of entries to return (default 100)
     
     Returns:
-        List of warning history entries, most recent first
+        List of warning history entries, most recent first. Each entry also
+        exposes ``created_ts``, the creation date as a Unix timestamp.
     """
     conn = database.get_db_connection()
     try:
         cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT * FROM warning_history 
+            SELECT *, CAST(strftime('%s', created_at) AS INTEGER) AS created_ts
+            FROM warning_history 
             WHERE guild_id = ? AND user_id = ?
             ORDER BY created_at DESC
             LIMIT ?
@@ -216,6 +232,9 @@ def add_mute(
     finally:
         conn.close()
 
+    if _mute_heap_loaded:
+        heapq.heappush(_mute_heap, (expires_at.isoformat(), guild_id, user_id))
+
 
 def remove_mute(
     guild_id: str, user_id: str, moderator_id: Optional[str], reason: str
@@ -276,20 +295,54 @@ def get_active_mute(guild_id: str, user_id: str) -> Optional[dict]:
         conn.close()
 
 
+def _load_mute_heap(conn) -> None:
+    """Load every active mute expiry into the in-memory heap."""
+    global _mute_heap_loaded
+    cursor = conn.cursor()
+    cursor.execute("SELECT expires_at, guild_id, user_id FROM active_mutes")
+    _mute_heap[:] = [tuple(row) for row in cursor.fetchall()]
+    heapq.heapify(_mute_heap)
+    _mute_heap_loaded = True
+
+
 def get_expired_mutes() -> list:
-    """Get all mutes that have expired."""
+    """Get all mutes that have expired.
+
+    The database is only queried when the heap says a mute is due.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    if _mute_heap_loaded and (not _mute_heap or _mute_heap[0][0] > now):
+        return []
+
     conn = database.get_db_connection()
     try:
+        if not _mute_heap_loaded:
+            _load_mute_heap(conn)
+
+        while _mute_heap and _mute_heap[0][0] <= now:
+            heapq.heappop(_mute_heap)
+
         cursor = conn.cursor()
-        now = datetime.now(timezone.utc).isoformat()
         cursor.execute("SELECT * FROM active_mutes WHERE expires_at <= ?", (now,))
-        return cursor.fetchall()
+        expired = cursor.fetchall()
     finally:
         conn.close()
 
+    # Returned mutes stay due until they are removed
+    for mute in expired:
+        heapq.heappush(
+            _mute_heap, (mute["expires_at"], mute["guild_id"], mute["user_id"])
+        )
+    return expired
+
 
 def get_moderation_config(guild_id: str) -> Optional[dict]:
-    """Get moderation configuration for a guild."""
+    """Get moderation configuration for a guild (cached for CONFIG_CACHE_TTL)."""
+    cached = _config_cache.get(guild_id)
+    if cached is not None and cached[0] > time.monotonic():
+        config = cached[1]
+        return dict(config) if config else None
+
     conn = database.get_db_connection()
     try:
         cursor = conn.cursor()
@@ -297,10 +350,18 @@ def get_moderation_config(guild_id: str) -> Optional[dict]:
             "SELECT * FROM moderation_config WHERE guild_id = ?", (guild_id,)
         )
         result = cursor.fetchone()
-        return dict(result) if result else None
+        config = dict(result) if result else None
     finally:
         conn.close()
 
+    _config_cache[guild_id] = (time.monotonic() + CONFIG_CACHE_TTL, config)
+    return dict(config) if config else None
+
+
+def invalidate_moderation_config(guild_id: str) -> None:
+    """Drop the cached moderation configuration of a guild."""
+    _config_cache.pop(guild_id, None)
+
 
 def set_moderation_config(guild_id: str, parameter: str, value: str) -> None:
     """Set a moderation configuration parameter for a guild."""
@@ -341,6 +402,7 @@ def set_moderation_config(guild_id: str, parameter: str, value: str) -> None:
         conn.commit()
     finally:
         conn.close()
+        invalidate_moderation_config(guild_id)
 
 
 def calculate_decay_days(warn_count: int, config: Optional[dict]) -> int: